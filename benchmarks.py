@@ -0,0 +1,296 @@
+"""Headless benchmarks for the game's hot paths, checked against a stored baseline.
+
+    python benchmarks.py                      # run, print, and compare against benchmarks_baseline.json
+    python benchmarks.py --save-baseline      # record the current timings as the new baseline
+    python benchmarks.py --full --output results.json
+
+Timings are the median of many repeats, in seconds per operation. Each repeat is measured against
+a fixed calibration workload timed next to it, so the machine's speed drifting during a run does
+not move the results. A benchmark fails when it is slower than its baseline by more than its tolerance.
+"""
+import argparse
+import copy
+import gc
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# No window and no audio device for headless runs
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+import bricks
+import vecenv
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks_baseline.json')
+TOLERANCE = 0.25  # Allowed slowdown over the baseline, as a fraction
+# Looser tolerances, by name prefix, for benchmarks that vary more than that from run to run:
+# save_score waits on fsync, a rewind is one short call per repeat, and drawing bricks one by one
+# is SDL work that doesn't track the pure-Python calibration closely
+TOLERANCES = {
+    'scores/save_score/': 0.5,
+    'snapshot/rewind': 0.5,
+    'render/brick_draw': 0.5,
+}
+
+
+def calibration_work():
+    # A fixed pure-Python workload that every timing is measured against
+    total = 0
+    for i in range(20000):
+        total += i * i % 7
+    return total
+
+
+def median_time(function, repeat=21, number=1, setup=None):
+    # Median time per call over `repeat` runs of `number` calls, with the garbage collector off like
+    # timeit, in units of the calibration workload: each run is divided by a run of the workload just
+    # before it. setup() runs untimed before each run and its result is passed to function.
+    ratios = []
+    for _ in range(repeat):
+        argument = setup() if setup else None
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            calibration_work()
+            reference = time.perf_counter() - start
+            start = time.perf_counter()
+            for _ in range(number):
+                function(argument) if setup else function()
+            ratios.append((time.perf_counter() - start) / number / reference)
+        finally:
+            gc.enable()
+    return statistics.median(ratios)
+
+
+def tolerance_for(name, default):
+    for prefix, tolerance in TOLERANCES.items():
+        if name.startswith(prefix):
+            return max(tolerance, default)
+    return default
+
+
+def calibrate():
+    # Seconds the calibration workload takes on this machine; comparisons are scaled by it so a
+    # slower or busier machine does not read as a regression
+    times = []
+    for _ in range(31):
+        start = time.perf_counter()
+        calibration_work()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def play_state(ball_count, extra_bricks, seed=0):
+    # A game in play with ball_count free balls and extra_bricks flashing bricks in the lower area
+    state = bricks.GameState(2, seed=seed)
+    state.paddle.rect.width = bricks.SCREEN_WIDTH  # Keep every ball in play
+    state.paddle.rect.x = 0
+    rng = random.Random(seed)
+    state.balls = []
+    for _ in range(ball_count):
+        ball = bricks.Ball(bricks.BALL_SPEEDS[2], rng.randint(0, bricks.SCREEN_WIDTH - 20), rng.randint(300, 500), rng)
+        ball.attached = False
+        ball.dx = rng.uniform(-5, 5)
+        state.balls.append(ball)
+    state.bricks.extend(bricks.create_flashing_bricks(extra_bricks, state.bricks, rng))
+    return state
+
+
+def bench_collision(results):
+    for ball_count in (1, 20, 100):
+        for extra_bricks in (0, 30):
+            results[f'step_game/balls={ball_count}/extra_bricks={extra_bricks}'] = median_time(
+                bricks.step_game, number=60, setup=lambda: play_state(ball_count, extra_bricks))
+
+
+def bench_spawn(results):
+    for fill in (0, 20, 40):
+        existing = play_state(0, fill).bricks
+
+        def flashing():
+            bricks.create_flashing_bricks(5, existing, random.Random(1))
+
+        def additional():
+            bricks.create_additional_bricks(3, existing, bricks.GREEN, random.Random(1))
+        results[f'create_flashing_bricks/filled={fill}'] = median_time(flashing, number=5)
+        results[f'create_additional_bricks/filled={fill}'] = median_time(additional, number=5)
+
+
+def bench_render(results):
+    screen = pygame.Surface((bricks.SCREEN_WIDTH, bricks.SCREEN_HEIGHT))
+    state = play_state(20, 10)
+
+    def draw_bricks():
+        for brick in state.bricks:
+            brick.draw(screen)
+    layer = bricks.BrickLayer()
+    layer.rebuild(state.bricks)
+    layer.draw(screen, state.bricks)  # An unchanged layer is blitted from its RLE copy from the second draw on
+    layer.draw(screen, state.bricks)
+    results['render/brick_draw'] = median_time(draw_bricks, number=50)
+    results['render/brick_layer'] = median_time(lambda: layer.draw(screen, state.bricks), number=50)
+    results['render/paddle_draw'] = median_time(lambda: state.paddle.draw(screen, 1234), number=200)
+
+    rng = random.Random(2)
+    balls = [bricks.Ball(5, rng.randint(0, bricks.SCREEN_WIDTH - 20), rng.randint(0, bricks.SCREEN_HEIGHT - 20), rng)
+             for _ in range(50)]
+    power_ups = [bricks.PowerUp(rng.randint(0, bricks.SCREEN_WIDTH - 15), rng.randint(0, bricks.SCREEN_HEIGHT - 15), name)
+                 for name in bricks.power_up_registry.names * 6]
+    results['render/ball_layer/balls=50'] = median_time(lambda: bricks.draw_balls(screen, balls, 0.5), number=200)
+    results['render/power_up_layer/power_ups=30'] = median_time(lambda: bricks.draw_power_ups(screen, power_ups, 0.5), number=200)
+
+
+def bench_snapshot(results):
+    # A procedural board of well over a thousand bricks, one step into play
+    state = bricks.GameState(2, seed=0, levels=bricks.ProceduralLevels(0))
+    bricks.launch(state)
+    bricks.step_game(state)
+    size = len(state.bricks)
+    encoder = bricks.SnapshotEncoder()
+    encoder.encode(state)
+    snapshot = encoder.encode(state)
+    results[f'snapshot/encode_full/bricks={size}'] = median_time(lambda: bricks.SnapshotEncoder().encode(state), number=5)
+    results[f'snapshot/encode_tick/bricks={size}'] = median_time(lambda: encoder.encode(state), number=200)
+    results[f'snapshot/restore/bricks={size}'] = median_time(lambda: bricks.restore_snapshot(snapshot, state.levels), number=5)
+    results[f'snapshot/restore_same_board/bricks={size}'] = median_time(
+        lambda: bricks.restore_snapshot(snapshot, state.levels, state.bricks), number=200)
+
+    # Two seconds of play, then rewinding back through it
+    ticks = []
+    for _ in range(120):
+        bricks.step_game(state)
+        ticks.append(encoder.encode(state))
+
+    def filled():
+        buffer = bricks.RewindBuffer()
+        for tick in ticks:
+            buffer.record(tick)
+        return buffer
+    results['snapshot/rewind_record'] = median_time(lambda buffer: buffer.record(encoder.encode(state)), repeat=101, setup=filled)
+    results['snapshot/rewind'] = median_time(lambda buffer: buffer.rewind(bricks.REWIND_SPEED), repeat=101, setup=filled)
+
+
+def bench_vecenv(results):
+    # One step of many games at once, after a second of play so balls are spread over the board. Every
+    # run steps a copy of the same games, since the games get busier the longer they are played.
+    for count in (256, 4096):
+        played = vecenv.VecEnv(count, seed=0)
+        played.reset()
+        for _ in range(60):
+            played.step(vecenv.track_actions(played))
+
+        def steps(env):
+            for _ in range(20):
+                env.step(vecenv.track_actions(env))
+        results[f'vecenv/step/envs={count}'] = median_time(steps, setup=lambda: copy.deepcopy(played)) / 20
+
+
+def bench_scores(results, sizes):
+    directory = tempfile.mkdtemp()
+    original_store = bricks.score_store
+    try:
+        for size in sizes:
+            log = os.path.join(directory, f'scores-{size}.jsonl')
+            rng = random.Random(size)
+            with open(log, 'w') as file:
+                for i in range(size):
+                    file.write(json.dumps({"initials": "AAA", "score": rng.randint(0, 500),
+                                           "total_time": "1 min 0 sec", "difficulty": rng.randint(1, 3)}) + "\n")
+
+            def store():
+                return bricks.ScoreStore(log, log + '.index', os.path.join(directory, 'none.json'))
+
+            def rebuild():
+                if os.path.exists(log + '.index'):
+                    os.remove(log + '.index')
+                bricks.score_store = store()
+                bricks.load_high_scores(2)
+
+            def load():
+                bricks.score_store = store()
+                bricks.load_high_scores(2)
+
+            def save():
+                bricks.save_score("BEN", 250, 60, 2)
+            results[f'scores/rebuild_index/entries={size}'] = median_time(rebuild, repeat=5)
+            results[f'scores/load_high_scores/entries={size}'] = median_time(load, number=20)
+            bricks.score_store = store()
+            results[f'scores/save_score/entries={size}'] = median_time(save, number=20)
+    finally:
+        bricks.score_store = original_store
+        shutil.rmtree(directory)
+
+
+def compare(results, baseline, tolerance):
+    failures = []
+    speed = results['calibration'] / baseline.get('calibration', results['calibration'])
+    for name, seconds in results.items():
+        base = baseline.get(name)
+        if name == 'calibration':
+            continue
+        if base is None:
+            print(f"{name:<50} {seconds * 1e6:12.1f} us  (no baseline)")
+            continue
+        ratio = seconds / base / speed
+        status = 'REGRESSED' if ratio > 1 + tolerance_for(name, tolerance) else 'ok'
+        print(f"{name:<50} {seconds * 1e6:12.1f} us  {ratio:5.2f}x baseline  {status}")
+        if status != 'ok':
+            failures.append(name)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the game's hot paths headless.")
+    parser.add_argument('--full', action='store_true', help="include the 1M-entry score benchmarks")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="baseline timings to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="write these timings as the baseline")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help="allowed slowdown, 0.25 means a quarter slower")
+    parser.add_argument('--output', help="also write the timings to this JSON file")
+    args = parser.parse_args()
+
+    calibration = calibrate()
+    results = {}
+    bench_collision(results)
+    bench_spawn(results)
+    bench_render(results)
+    bench_snapshot(results)
+    bench_vecenv(results)
+    bench_scores(results, (10000, 100000, 1000000) if args.full else (10000, 100000))
+    # Report seconds at this run's calibration; compare() divides it back out
+    results = {'calibration': calibration, **{name: units * calibration for name, units in results.items()}}
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=4)
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as file:
+                baseline = json.load(file)
+        baseline.update(results)
+        with open(args.baseline, 'w') as file:
+            json.dump(baseline, file, indent=4, sort_keys=True)
+        print(f"saved {len(results)} timings to {args.baseline}")
+        return
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    print(f"machine speed {baseline.get('calibration', results['calibration']) / results['calibration']:.2f}x the baseline's")
+    failures = compare(results, baseline, args.tolerance)
+    if failures:
+        print(f"{len(failures)} benchmark(s) regressed past the baseline")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
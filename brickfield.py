@@ -0,0 +1,90 @@
+import numpy as np
+from collections import namedtuple
+
+from bricks import BRICK_WIDTH, BRICK_HEIGHT, BRICK_PADDING, BRICK_ROWS, BRICK_COLUMNS, BRICK_COLORS, DARK_COLOR_MAP, power_up_registry
+
+NO_POWER_UP = -1
+
+# Result of one batched collision pass; every field is an index array. power_ups are the destroyed bricks
+# that dropped one and power_up_types index power_up_registry.names for each of them.
+FieldHits = namedtuple('FieldHits', ['ball_index', 'brick_index', 'destroyed', 'power_ups', 'power_up_types'])
+
+
+def roll_power_ups(count, rng):
+    # Same single weighted roll as power_up_registry.roll, for count destroyed bricks at once
+    rolls = np.searchsorted(power_up_registry.thresholds, rng.random(count), side='right')
+    return np.where(rolls < len(power_up_registry.names), rolls, NO_POWER_UP)
+
+
+# Brick field stored as parallel arrays, an alternative to a list of Brick objects for very large boards
+class BrickField:
+    def __init__(self, x, y, color, requires_two_hits, width=BRICK_WIDTH, height=BRICK_HEIGHT):
+        self.x = np.asarray(x, dtype=np.int32)
+        self.y = np.asarray(y, dtype=np.int32)
+        self.width = width
+        self.height = height
+        count = len(self.x)
+        self.color = np.array(color, dtype=np.uint8).reshape(count, 3)
+        self.requires_two_hits = np.asarray(requires_two_hits, dtype=bool)
+        self.hit = np.zeros(count, dtype=bool)
+        self.alive = np.ones(count, dtype=bool)
+
+    @classmethod
+    def from_bricks(cls, bricks):
+        bricks = list(bricks)
+        return cls([brick.rect.x for brick in bricks],
+                   [brick.rect.y for brick in bricks],
+                   [brick.color for brick in bricks],
+                   [brick.requires_two_hits for brick in bricks])
+
+    @classmethod
+    def from_level(cls, level):
+        # Straight from a Level's (x, y, hits, color) tuples, e.g. a large generate_level board, without building Bricks
+        x, y, hits, color = zip(*level.bricks) if level.bricks else ((), (), (), ())
+        width, height = level.brick_size
+        return cls(x, y, [BRICK_COLORS[index] for index in color], np.asarray(hits) > 1, width=width, height=height)
+
+    @classmethod
+    def grid(cls, color, rows=BRICK_ROWS, columns=BRICK_COLUMNS, rng=None):
+        # Same layout rules as create_bricks, for any number of rows and columns
+        rng = np.random.default_rng() if rng is None else rng
+        cols, rows = np.meshgrid(np.arange(columns), np.arange(rows))
+        x = cols.ravel() * (BRICK_WIDTH + BRICK_PADDING) + BRICK_PADDING
+        y = rows.ravel() * (BRICK_HEIGHT + BRICK_PADDING) + BRICK_PADDING
+        count = len(x)
+        return cls(x, y, np.tile(color, (count, 1)), rng.random(count) < 0.5)
+
+    def __len__(self):
+        return int(self.alive.sum())
+
+    def cracked_color(self, index):
+        return DARK_COLOR_MAP[tuple(int(c) for c in self.color[index])]
+
+    def collide(self, ball_x, ball_y, ball_size, rng=None):
+        # Test every ball against every live brick in one pass, using the same overlap rule as Rect.colliderect
+        ball_x = np.asarray(ball_x, dtype=np.int32)[:, None]
+        ball_y = np.asarray(ball_y, dtype=np.int32)[:, None]
+        live = np.flatnonzero(self.alive)
+        bx = self.x[live]
+        by = self.y[live]
+        overlap = ((ball_x < bx + self.width) & (bx < ball_x + ball_size) &
+                   (ball_y < by + self.height) & (by < ball_y + ball_size))
+        ball_index, live_index = np.nonzero(overlap)
+        brick_index = live[live_index]
+        if not len(brick_index):
+            empty = np.empty(0, dtype=np.intp)
+            return FieldHits(ball_index, brick_index, empty, empty, empty)
+
+        # Apply the hits like Brick.hit_brick would, one after another
+        hit_bricks, hit_counts = np.unique(brick_index, return_counts=True)
+        previous_hits = self.hit[hit_bricks].astype(np.intp)
+        destroyed_mask = ~self.requires_two_hits[hit_bricks] | (previous_hits + hit_counts >= 2)
+        destroyed = hit_bricks[destroyed_mask]
+        cracked = hit_bricks[self.requires_two_hits[hit_bricks] & (previous_hits == 0)]  # Even if the second hit follows
+        for index in cracked:
+            self.color[index] = self.cracked_color(index)
+        self.hit[cracked] = True
+        self.alive[destroyed] = False
+        rolls = roll_power_ups(len(destroyed), np.random.default_rng() if rng is None else rng)
+        dropped = rolls != NO_POWER_UP
+        return FieldHits(ball_index, brick_index, destroyed, destroyed[dropped], rolls[dropped])
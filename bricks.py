@@ -3,11 +3,19 @@ import random
 import os
 import time
 import json
+import bisect
+import csv
+import queue
+import struct
+import zlib
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from pygame.locals import *
 
-# Initialize pygame
-pygame.init()
-pygame.mixer.init()
+# pygame subsystems, the window and assets are brought up by startup() (called from main), not on import,
+# so simulation, replay and scoring tools can import this module without a display or audio device
 
 # Screen dimensions
 SCREEN_WIDTH = 860
@@ -50,6 +58,7 @@ BRICK_COLORS = [GREEN, YELLOW, CYAN, MAGENTA, ORANGE, PURPLE]
 
 # Paddle properties
 PADDLE_BASE_WIDTH = 100
+PADDLE_MAX_WIDTH = SCREEN_WIDTH  # Expand power-ups stop growing the paddle here
 PADDLE_HEIGHT = 20
 PADDLE_SPEED = 10
 PADDLE_MAX_SPEED = 20
@@ -58,6 +67,7 @@ PADDLE_ACCELERATION = 1
 # Ball properties
 BALL_RADIUS = 10
 BALL_SPEEDS = {1: 3, 2: 5, 3: 7}  # Different speeds for different difficulty levels
+MAX_BOUNCES_PER_STEP = 4  # Brick impacts resolved for one ball within a single physics step
 
 # Brick properties
 BRICK_WIDTH = 75
@@ -66,33 +76,508 @@ BRICK_PADDING = 10
 BRICK_ROWS = 7
 BRICK_COLUMNS = 10
 
+# Brick grid properties (one cell per brick slot of the standard layout)
+GRID_CELL_WIDTH = BRICK_WIDTH + BRICK_PADDING
+GRID_CELL_HEIGHT = BRICK_HEIGHT + BRICK_PADDING
+
+# Level properties
+LEVELS = os.environ.get("BRICKS_LEVELS")  # Level pack file, or "procedural[:seed]"; the built-in wall when unset
+PROCEDURAL_ROWS = 40
+PROCEDURAL_COLUMNS = 50
+PROCEDURAL_PADDING = 2
+PROCEDURAL_DENSITY = 0.8  # Share of slots that get a brick
+PROCEDURAL_TWO_HIT_SHARE = 0.3
+PROCEDURAL_POWER_UPS_PER_LEVEL = 25  # Expected drops per generated board, however many bricks it has
+
 # Power-up properties
 POWER_UP_SIZE = 15
 POWER_UP_SPEED = 5
-EXPAND_POWER_UP_CHANCE = 0.05  
-EXTRA_BALL_POWER_UP_CHANCE = 0.10  
-ADDITIONAL_BRICKS_POWER_UP_CHANCE = 0.10  
-REMOVE_BALLS_POWER_UP_CHANCE = 0.10  
-SHOOTING_POWER_UP_CHANCE = 0.05  
-
-# Initialize the screen
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Brick Breaker")
+# Chance that a destroyed brick drops each power-up; together they must add up to at most 1. These
+# are the rates the original one-after-another checks gave (5%, then 10%, 10% and 10% of what was
+# left, then 5%), so about 34% of destroyed bricks drop one.
+EXPAND_POWER_UP_CHANCE = 0.05
+EXTRA_BALL_POWER_UP_CHANCE = 0.095
+ADDITIONAL_BRICKS_POWER_UP_CHANCE = 0.0855
+REMOVE_BALLS_POWER_UP_CHANCE = 0.07695
+SHOOTING_POWER_UP_CHANCE = 0.0346275
+
+# Timing properties
+PHYSICS_STEP = 1 / 60  # Fixed simulation step in seconds; all per-step speeds above are tuned for 60 steps per second
+RENDER_FPS = 60  # Display rate cap, can be raised to 144 or dropped to 30 without changing game speed
+MAX_FRAME_TIME = 0.25  # Longest frame fed to the simulation, so a stall doesn't trigger a burst of catch-up steps
+INTERPOLATE_RENDER = True  # Draw moving objects between their last two physics positions
+DIRTY_RECT_RENDERING = True  # During play, redraw and push only the regions that changed instead of the whole screen
+
+# Frame budget properties. Under load the governor steps down one quality tier at a time, and back up
+# once there is headroom again.
+FRAME_BUDGET = 1 / RENDER_FPS  # Seconds of work allowed per frame, not counting the wait for the next frame
+GOVERNOR_ENABLED = os.environ.get("BRICKS_GOVERNOR", "1") != "0"
+GOVERNOR_WINDOW = 30  # Frames averaged before deciding
+GOVERNOR_DOWNGRADE_AT = 1.0  # Step down when the average frame uses this share of the budget
+GOVERNOR_UPGRADE_AT = 0.5    # Step back up when it uses less than this share
+QUALITY_FULL = 0
+QUALITY_MERGE_SOUNDS = 1     # Same sound can't restart for SOUND_REPEAT_INTERVAL * MERGED_SOUND_FACTOR
+QUALITY_STATIC_FLASHING = 2  # Flashing bricks stop flashing and go in the static brick layer
+QUALITY_NO_BACKGROUND = 3    # Plain black instead of the background image
+QUALITY_BALL_CAP = 4         # Extra balls and shots stop adding balls past MAX_BALLS_UNDER_LOAD
+QUALITY_TIER_NAMES = ['full', 'merge sounds', 'static flashing', 'no background', 'ball cap']
+MERGED_SOUND_FACTOR = 4
+MAX_BALLS_UNDER_LOAD = 8
+
+# Text properties
+TEXT_CACHE_SIZE = 256  # Rendered text surfaces kept before the least recently used is dropped
+
+# Sprite properties
+SPRITE_COLORKEY = (255, 0, 254)  # Transparent color of sprites that aren't rectangles
+PADDLE_TIP_WIDTH = 5
+PADDLE_SPRITE_EXPANSIONS = 4  # Expanded paddle widths drawn at startup for each difficulty; wider ones are drawn when first needed
+
+# Profiling properties
+PROFILE_OUTPUT = os.environ.get("BRICKS_PROFILE")  # Set to a .json or .csv path to profile frames and dump them on exit
+PROFILE_WINDOW = 600  # Frames in the rolling window the percentiles are taken over
+PROFILE_HISTORY = 100000  # Frames kept for the dump
+PROFILE_PHASES = ['events', 'paddle', 'collision', 'power_ups', 'audio', 'snapshot', 'render', 'flip']
+
+# Session recording properties
+RECORD_DIR = os.environ.get("BRICKS_RECORD_DIR")  # Set to a directory to record every game for replay
+
+# Snapshot properties
+SAVE_FILE = os.environ.get("BRICKS_SAVE_FILE", "savegame.bks")  # A paused or interrupted game, resumed from the splash screen
+CHECKPOINT_INTERVAL = 5.0  # Seconds of play between saves, so a crash loses at most this much of a game
+REWIND_SECONDS = 10  # Play kept for rewinding with Backspace
+REWIND_KEYFRAME_INTERVAL = 60  # Ticks between full snapshots in the rewind buffer; the ticks between are deltas
+REWIND_BUFFER_BYTES = 16 * 1024 * 1024  # Memory the rewind buffer may use, if it fills before REWIND_SECONDS
+REWIND_SPEED = 2  # Ticks rewound per frame while Backspace is held
+
+# Score properties
+SCORES_FILE = "scores.jsonl"  # Append-only log, one JSON score per line
+SCORES_INDEX_FILE = "scores_top.json"  # Top scores per difficulty and how much of the log they cover
+LEGACY_SCORES_FILE = "scores.json"  # Old whole-file format, migrated into the log once
+HIGH_SCORES_SHOWN = 10
+SCORE_FIELDS = {"initials", "score", "total_time", "difficulty"}  # Every entry has these; lines without them are skipped
+
+# Pool properties
+POOL_LIMIT = 256  # Released objects kept per pool for reuse
+
+# Audio properties
+AUDIO_ENABLED = os.environ.get("BRICKS_AUDIO", "1") != "0"  # BRICKS_AUDIO=0 runs silently without opening an audio device
+SOUND_CHANNELS = 8  # Mixer channels reserved for sound effects
+SOUND_REPEAT_INTERVAL = 0.05  # Seconds before the same sound can start again; repeats inside the window are merged
+
+# Asset properties
+ASSET_CACHE_BYTES = 64 * 1024 * 1024  # Memory allowed for decoded and scaled images before the least recently used is dropped
+
+# The window, opened by startup()
+screen = None
+
+# Shared fonts plus an LRU cache of rendered text surfaces keyed by (text, size, color)
+class TextCache:
+    def __init__(self, max_size=TEXT_CACHE_SIZE):
+        self.max_size = max_size
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            font = self.fonts[size] = pygame.font.Font(None, size)
+        return font
+
+    def render(self, text, size, color):
+        key = (text, size, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+        self.misses += 1
+        surface = self.surfaces[key] = self.font(size).render(text, True, color)
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+text_cache = TextCache()
+
+# Ball, paddle and power-up sprites, drawn once and blitted from then on so each layer of a frame is
+# a single Surface.blits call instead of a draw call per object. Sprites missing from the atlas are
+# drawn when first asked for, and converted to the display format once there is a window.
+class SpriteAtlas:
+    def __init__(self):
+        self.sprites = {}
+
+    def build(self):
+        # Called by startup() once the window is open
+        self.sprites = {}
+        self.ball()
+        for name in power_up_registry.kinds:
+            self.power_up(name)
+        for difficulty in BALL_SPEEDS:
+            width = PADDLE_BASE_WIDTH - (difficulty - 2) * 20
+            for _ in range(PADDLE_SPRITE_EXPANSIONS + 1):
+                self.paddle(width)
+                width = int(width * 1.25)
+
+    def add(self, key, surface, colorkey=None):
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        if colorkey is not None:
+            surface.set_colorkey(colorkey, RLEACCEL)
+        self.sprites[key] = surface
+        return surface
+
+    def ball(self):
+        surface = self.sprites.get('ball')
+        if surface is None:
+            surface = pygame.Surface((BALL_RADIUS * 2, BALL_RADIUS * 2))
+            surface.fill(SPRITE_COLORKEY)
+            pygame.draw.circle(surface, RED, (BALL_RADIUS, BALL_RADIUS), BALL_RADIUS)
+            surface = self.add('ball', surface, SPRITE_COLORKEY)
+        return surface
+
+    def paddle(self, width):
+        key = ('paddle', width)
+        surface = self.sprites.get(key)
+        if surface is None:
+            surface = pygame.Surface((width, PADDLE_HEIGHT))
+            surface.fill(BLUE)
+            # White tips
+            surface.fill(WHITE, (0, 0, PADDLE_TIP_WIDTH, PADDLE_HEIGHT))
+            surface.fill(WHITE, (width - PADDLE_TIP_WIDTH, 0, PADDLE_TIP_WIDTH, PADDLE_HEIGHT))
+            surface = self.add(key, surface)
+        return surface
+
+    def power_up(self, name):
+        key = ('power_up', name)
+        surface = self.sprites.get(key)
+        if surface is None:
+            surface = pygame.Surface((POWER_UP_SIZE, POWER_UP_SIZE))
+            surface.fill(power_up_registry.kinds[name].color)
+            surface = self.add(key, surface)
+        return surface
+
+atlas = SpriteAtlas()
+
+# Blit a whole layer of balls in one call, each between its last two physics positions; returns the rects drawn
+def draw_balls(screen, balls, alpha=1.0):
+    sprite = atlas.ball()
+    return screen.blits([(sprite, (round(ball.prev_x + (ball.rect.x - ball.prev_x) * alpha),
+                                   round(ball.prev_y + (ball.rect.y - ball.prev_y) * alpha))) for ball in balls])
+
+def draw_power_ups(screen, power_ups, alpha=1.0):
+    sprites = atlas.sprites
+    return screen.blits([(sprites.get(('power_up', power_up.type)) or atlas.power_up(power_up.type),
+                          (power_up.rect.x, round(power_up.prev_y + (power_up.rect.y - power_up.prev_y) * alpha)))
+                         for power_up in power_ups])
+
+# Opt-in per-phase frame timing with rolling percentiles, an on-screen overlay (F3) and a dump on exit
+class FrameProfiler:
+    def __init__(self, output=PROFILE_OUTPUT):
+        self.output = output
+        self.enabled = bool(output)
+        self.show_overlay = False
+        self.window = {phase: deque(maxlen=PROFILE_WINDOW) for phase in PROFILE_PHASES + ['frame']}
+        self.history = deque(maxlen=PROFILE_HISTORY)
+        self.frame = None
+        self.frame_start = self.last = 0.0
+        self.frame_count = 0
+        self.overlay_surface = None
+        self.startup = {}  # Seconds taken by each startup stage
+
+    def toggle_overlay(self):
+        self.show_overlay = not self.show_overlay
+        self.enabled = self.enabled or self.show_overlay
+
+    def begin_frame(self):
+        if self.enabled:
+            self.frame = dict.fromkeys(PROFILE_PHASES, 0.0)
+            self.frame_start = self.last = time.perf_counter()
+
+    def mark(self, phase):
+        # Charge the time since the previous mark to phase
+        if self.frame is not None:
+            now = time.perf_counter()
+            self.frame[phase] += now - self.last
+            self.last = now
+
+    def end_frame(self, state=None, quality_tier=QUALITY_FULL):
+        if self.frame is None:
+            return
+        frame = self.frame
+        frame['frame'] = self.last - self.frame_start
+        for phase, seconds in frame.items():
+            self.window[phase].append(seconds)
+        frame['ball_count'] = len(state.balls) if state else 0
+        frame['brick_count'] = len(state.bricks) if state else 0
+        frame['power_up_count'] = len(state.power_ups) if state else 0
+        frame['quality_tier'] = quality_tier
+        self.history.append(frame)
+        self.frame = None
+        self.frame_count += 1
+
+    def percentiles(self, phase):
+        samples = sorted(self.window[phase])
+        if not samples:
+            return 0.0, 0.0, 0.0
+        return tuple(samples[min(len(samples) - 1, int(len(samples) * p))] for p in (0.50, 0.95, 0.99))
+
+    def draw_overlay(self, screen):
+        # The text changes every frame, so it is rebuilt a couple of times a second instead of going through text_cache
+        if self.overlay_surface is None or self.frame_count % 30 == 0:
+            font = text_cache.font(20)
+            lines = ["phase        p50    p95    p99 (ms)"]
+            for phase in PROFILE_PHASES + ['frame']:
+                p50, p95, p99 = self.percentiles(phase)
+                lines.append(f"{phase:<10} {p50 * 1000:6.2f} {p95 * 1000:6.2f} {p99 * 1000:6.2f}")
+            last = self.history[-1] if self.history else {}
+            lines.append(f"balls {last.get('ball_count', 0)}  bricks {last.get('brick_count', 0)}  power-ups {last.get('power_up_count', 0)}")
+            lines.append(f"quality: {QUALITY_TIER_NAMES[governor.tier]} ({governor.reason})")
+            rendered = [font.render(line, True, WHITE) for line in lines]
+            self.overlay_surface = pygame.Surface((max(line.get_width() for line in rendered) + 10, 18 * len(rendered) + 10))
+            self.overlay_surface.set_alpha(200)
+            for i, line in enumerate(rendered):
+                self.overlay_surface.blit(line, (5, 5 + 18 * i))
+        return screen.blit(self.overlay_surface, (SCREEN_WIDTH - self.overlay_surface.get_width() - 5, 5))
+
+    def dump(self):
+        if not self.output or not self.history:
+            return
+        columns = PROFILE_PHASES + ['frame', 'ball_count', 'brick_count', 'power_up_count', 'quality_tier']
+        if self.output.endswith('.csv'):
+            with open(self.output, 'w', newline='') as file:
+                writer = csv.DictWriter(file, fieldnames=columns)
+                writer.writeheader()
+                writer.writerows(self.history)
+        else:
+            summary = {phase: dict(zip(('p50', 'p95', 'p99'), self.percentiles(phase))) for phase in PROFILE_PHASES + ['frame']}
+            with open(self.output, 'w') as file:
+                json.dump({'summary': summary, 'startup': self.startup, 'frames': list(self.history)}, file)
+
+profiler = FrameProfiler()
+
+# Keeps frame work inside FRAME_BUDGET by trading quality for time, one tier at a time. tier and
+# reason say where it stands and why it last moved; callers apply the tier (see main).
+class FrameGovernor:
+    def __init__(self, budget=FRAME_BUDGET, enabled=GOVERNOR_ENABLED):
+        self.budget = budget
+        self.enabled = enabled
+        self.tier = QUALITY_FULL
+        self.max_tier = len(QUALITY_TIER_NAMES) - 1
+        self.reason = "starting at full quality"
+        self.samples = deque(maxlen=GOVERNOR_WINDOW)
+
+    def update(self, work_time):
+        # Feed the time spent on one frame; returns True when the tier changed
+        if not self.enabled:
+            return False
+        self.samples.append(work_time)
+        if len(self.samples) < self.samples.maxlen:
+            return False
+        average = sum(self.samples) / len(self.samples)
+        usage = f"frames averaged {average * 1000:.1f} ms of the {self.budget * 1000:.1f} ms budget"
+        if average >= self.budget * GOVERNOR_DOWNGRADE_AT and self.tier < self.max_tier:
+            self.set_tier(self.tier + 1, usage)
+        elif average < self.budget * GOVERNOR_UPGRADE_AT and self.tier > QUALITY_FULL:
+            self.set_tier(self.tier - 1, usage)
+        else:
+            return False
+        return True
+
+    def limit(self, max_tier, reason):
+        # Keep the tier at or below max_tier, e.g. nothing that changes gameplay while a game is being recorded
+        self.max_tier = max_tier
+        if self.tier > max_tier:
+            self.set_tier(max_tier, reason)
+            return True
+        return False
+
+    def set_tier(self, tier, reason):
+        self.tier = tier
+        self.reason = reason
+        self.samples.clear()  # Judge the new tier on its own frames
+        if profiler.enabled:
+            print(f"quality tier {tier} ({QUALITY_TIER_NAMES[tier]}): {reason}")
+
+governor = FrameGovernor()
 
 # Clock for controlling the frame rate
 clock = pygame.time.Clock()
 
-# Load sounds
-brick_hit_sound = pygame.mixer.Sound('media/audio/brick_hit.wav')
-paddle_hit_sound = pygame.mixer.Sound('media/audio/paddle_hit.wav')
-bonus_brick_sound = pygame.mixer.Sound('media/audio/bonus_brick.wav')
+# Sounds (loaded through the asset manager)
+brick_hit_sound = 'media/audio/brick_hit.wav'
+paddle_hit_sound = 'media/audio/paddle_hit.wav'
+bonus_brick_sound = 'media/audio/bonus_brick.wav'
+
+# When every reserved channel is busy, a sound can cut off one of lower priority
+SOUND_PRIORITIES = {
+    bonus_brick_sound: 2,
+    paddle_hit_sound: 1,
+    brick_hit_sound: 0,
+}
 
 # Load music
 splash_music = 'media/audio/splash.mp3'
 game_over_music = 'media/audio/game_over.mp3'
 
-# Load background images
-bg_images = [os.path.join('media/bg', file) for file in os.listdir('media/bg') if file.endswith('.jpg')]
+# Background images, listed the first time one is needed
+BACKGROUND_DIR = 'media/bg'
+
+# Loads images and sounds on a background thread and keeps them cached
+class AssetManager:
+    def __init__(self, max_bytes=ASSET_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.images = OrderedDict()  # (path, size) -> converted surface, least recently used first
+        self.image_bytes = 0
+        self.sounds = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='assets')
+        self.pending_background = None
+        self.backgrounds = None
+
+    def image(self, path, size=(SCREEN_WIDTH, SCREEN_HEIGHT)):
+        key = (path, size)
+        with self.lock:
+            surface = self.images.get(key)
+            if surface is not None:
+                self.images.move_to_end(key)
+                return surface
+        surface = pygame.transform.scale(pygame.image.load(path), size).convert()
+        with self.lock:
+            if key not in self.images:
+                self.images[key] = surface
+                self.image_bytes += surface.get_bytesize() * size[0] * size[1]
+            while self.image_bytes > self.max_bytes and len(self.images) > 1:
+                (_, old_size), old_surface = self.images.popitem(last=False)
+                self.image_bytes -= old_surface.get_bytesize() * old_size[0] * old_size[1]
+        return surface
+
+    def prefetch_background(self):
+        # Pick the next background now and decode it in the background while the current level plays
+        if self.backgrounds is None:
+            self.backgrounds = [os.path.join(BACKGROUND_DIR, file) for file in os.listdir(BACKGROUND_DIR) if file.endswith('.jpg')]
+        self.pending_background = self.executor.submit(self.image, random.choice(self.backgrounds))
+
+    def next_background(self):
+        # Hand over the prefetched background (normally already decoded) and start on the one after it
+        if self.pending_background is None:
+            self.prefetch_background()
+        background = self.pending_background.result()
+        self.prefetch_background()
+        return background
+
+    def sound(self, path):
+        sound = self.sounds.get(path)
+        if sound is None:
+            sound = self.sounds[path] = pygame.mixer.Sound(path)
+        return sound
+
+    def preload_sounds(self, paths):
+        for path in paths:
+            self.executor.submit(self.sound, path)
+
+assets = AssetManager()
+
+# Plays the sounds queued during a frame once per frame: each sound at most once per
+# SOUND_REPEAT_INTERVAL, on a pool of reserved channels shared out by priority. Music goes through
+# here too, so with audio disabled nothing touches the mixer.
+class AudioDispatcher:
+    def __init__(self, enabled=AUDIO_ENABLED, channels=SOUND_CHANNELS, repeat_interval=SOUND_REPEAT_INTERVAL):
+        self.enabled = enabled
+        self.channel_count = channels
+        self.repeat_interval = repeat_interval
+        self.channels = []
+        self.priorities = []  # Priority of the sound each channel last started
+        self.queued = {}  # Sounds requested since the last flush, without repeats
+        self.last_played = {}  # sound -> when it last started
+
+    def start(self):
+        # Open the audio device and reserve the effect channels; audio is turned off if there is no device
+        if not self.enabled:
+            return
+        try:
+            pygame.mixer.init()
+        except pygame.error as error:
+            print(f"audio disabled: {error}")
+            self.enabled = False
+            return
+        pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), self.channel_count))
+        pygame.mixer.set_reserved(self.channel_count)
+        self.channels = [pygame.mixer.Channel(i) for i in range(self.channel_count)]
+        self.priorities = [0] * self.channel_count
+
+    def queue(self, sounds):
+        if self.enabled:
+            for sound in sounds:
+                self.queued[sound] = None
+
+    def flush(self, now=None):
+        if not self.queued:
+            return
+        now = time.perf_counter() if now is None else now
+        for sound in sorted(self.queued, key=lambda sound: -SOUND_PRIORITIES.get(sound, 0)):
+            if now - self.last_played.get(sound, float('-inf')) < self.repeat_interval:
+                continue
+            priority = SOUND_PRIORITIES.get(sound, 0)
+            index = self.free_channel(priority)
+            if index is None:
+                continue
+            self.channels[index].play(assets.sound(sound))
+            self.priorities[index] = priority
+            self.last_played[sound] = now
+        self.queued.clear()
+
+    def free_channel(self, priority):
+        # An idle channel, or else the one playing the lowest priority sound if that is below priority
+        lowest = None
+        for index, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                return index
+            if lowest is None or self.priorities[index] < self.priorities[lowest]:
+                lowest = index
+        return lowest if lowest is not None and self.priorities[lowest] < priority else None
+
+    def preload(self, sounds):
+        if self.enabled:
+            assets.preload_sounds(sounds)
+
+    def play_music(self, path, loops=0):
+        if self.enabled:
+            pygame.mixer.music.load(path)
+            pygame.mixer.music.play(loops)
+
+    def stop_music(self):
+        if self.enabled:
+            pygame.mixer.music.stop()
+
+audio = AudioDispatcher()
+
+# Free list of released game objects. Balls, power-ups and bricks come and go all game long, so they
+# are reinitialised in place through setup() instead of being reallocated, which keeps the GC quiet.
+class Pool:
+    def __init__(self, cls, limit=POOL_LIMIT):
+        self.cls = cls
+        self.limit = limit
+        self.free = []
+
+    def acquire(self, *args, **kwargs):
+        # pop() is atomic, so a level being built on the level thread can share the pool with the game
+        try:
+            obj = self.free.pop()
+        except IndexError:
+            return self.cls(*args, **kwargs)
+        obj.setup(*args, **kwargs)
+        return obj
+
+    def release(self, obj):
+        if len(self.free) < self.limit:
+            self.free.append(obj)
+
+    def release_all(self, objects):
+        for obj in objects:
+            self.release(obj)
 
 # Paddle class
 class Paddle:
@@ -104,6 +589,10 @@ class Paddle:
         self.current_speed = PADDLE_SPEED
         self.shooting_power = False
         self.balls_to_shoot = 0
+        self.remember_position()
+
+    def remember_position(self):
+        self.prev_x = self.rect.x
 
     def move(self, direction):
         if direction == 'left' and self.rect.left > 0:
@@ -122,23 +611,15 @@ class Paddle:
     def reset_speed(self):
         self.current_speed = self.base_speed
 
-    def draw(self, screen, score):
-        pygame.draw.rect(screen, BLUE, self.rect)
-        self.draw_score(screen, score)
-
-        # Draw white tips
-        tip_width = 5
-        pygame.draw.rect(screen, WHITE, (self.rect.left, self.rect.top, tip_width, PADDLE_HEIGHT))
-        pygame.draw.rect(screen, WHITE, (self.rect.right - tip_width, self.rect.top, tip_width, PADDLE_HEIGHT))
-
-    def draw_score(self, screen, score):
-        font = pygame.font.Font(None, 36)
-        score_text = font.render(str(score), True, WHITE)
-        text_rect = score_text.get_rect(center=self.rect.center)
-        screen.blit(score_text, text_rect)
+    def draw(self, screen, score, alpha=1.0):
+        rect = self.rect.move(round((self.prev_x - self.rect.x) * (1 - alpha)), 0)
+        score_text = text_cache.render(str(score), 36, WHITE)
+        paddle_rect, text_rect = screen.blits([(atlas.paddle(rect.width), rect),
+                                               (score_text, score_text.get_rect(center=rect.center))])
+        return paddle_rect.union(text_rect)
 
     def expand(self):
-        self.rect.width = int(self.rect.width * 1.25)
+        self.rect.width = min(int(self.rect.width * 1.25), PADDLE_MAX_WIDTH)
 
     def reset_size(self):
         self.rect.width = self.original_width
@@ -153,26 +634,64 @@ class Paddle:
 
 # Ball class
 class Ball:
-    def __init__(self, speed, x=None, y=None):
-        self.rect = pygame.Rect((SCREEN_WIDTH // 2 - BALL_RADIUS if x is None else x,
-                                 SCREEN_HEIGHT // 2 - BALL_RADIUS if y is None else y),
-                                (BALL_RADIUS * 2, BALL_RADIUS * 2))
-        self.dx = speed * random.choice([-1, 1])
+    __slots__ = ('rect', 'rng', 'dx', 'dy', 'attached', 'speed', 'prev_x', 'prev_y')
+
+    def __init__(self, speed, x=None, y=None, rng=random):
+        self.rect = pygame.Rect(0, 0, BALL_RADIUS * 2, BALL_RADIUS * 2)
+        self.setup(speed, x, y, rng)
+
+    def setup(self, speed, x=None, y=None, rng=random):
+        self.rect.topleft = (SCREEN_WIDTH // 2 - BALL_RADIUS if x is None else x,
+                             SCREEN_HEIGHT // 2 - BALL_RADIUS if y is None else y)
+        self.rng = rng
+        self.dx = speed * rng.choice([-1, 1])
         self.dy = -speed
         self.attached = True
         self.speed = speed
+        self.remember_position()
 
     def reset(self, paddle):
-        self.rect = pygame.Rect((paddle.rect.centerx - BALL_RADIUS, paddle.rect.top - BALL_RADIUS * 2),
-                                (BALL_RADIUS * 2, BALL_RADIUS * 2))
-        self.dx = self.speed * random.choice([-1, 1])
+        self.rect.topleft = (paddle.rect.centerx - BALL_RADIUS, paddle.rect.top - BALL_RADIUS * 2)
+        self.dx = self.speed * self.rng.choice([-1, 1])
         self.dy = -self.speed
         self.attached = True
-
-    def move(self):
-        if not self.attached:
-            self.rect.x += self.dx
-            self.rect.y += self.dy
+        self.remember_position()
+
+    def remember_position(self):
+        self.prev_x, self.prev_y = self.rect.x, self.rect.y
+
+    def move(self, bricks=None):
+        # Sweep the ball along its velocity, bouncing off bricks in the order they are struck.
+        # Returns the bricks hit during this step.
+        hits = []
+        if self.attached:
+            return hits
+        x, y = float(self.rect.x), float(self.rect.y)
+        remaining = 1.0
+        while remaining > 0 and len(hits) < MAX_BOUNCES_PER_STEP:
+            step_x, step_y = self.dx * remaining, self.dy * remaining
+            impact = None
+            if bricks is not None:
+                path = pygame.Rect(int(min(x, x + step_x)) - 1, int(min(y, y + step_y)) - 1,
+                                   int(abs(step_x)) + BALL_RADIUS * 2 + 3, int(abs(step_y)) + BALL_RADIUS * 2 + 3)
+                for brick in bricks.query(path):
+                    if brick in hits:
+                        continue
+                    brick_impact = sweep_circle_rect(x + BALL_RADIUS, y + BALL_RADIUS, BALL_RADIUS, step_x, step_y, brick.rect)
+                    if brick_impact and (impact is None or brick_impact[0] < impact[0]):
+                        impact = brick_impact + (brick,)
+            if impact is None:
+                x += step_x
+                y += step_y
+                break
+            t, normal_x, normal_y, brick = impact
+            x += step_x * t
+            y += step_y * t
+            self.bounce_off_normal(normal_x, normal_y)
+            remaining *= 1 - t
+            hits.append(brick)
+        self.rect.x, self.rect.y = round(x), round(y)
+        return hits
 
     def bounce(self, axis):
         if axis == 'x':
@@ -180,6 +699,12 @@ class Ball:
         elif axis == 'y':
             self.dy = -self.dy
 
+    def bounce_off_normal(self, normal_x, normal_y):
+        # Reflect the velocity about the surface normal of the face that was struck
+        dot = self.dx * normal_x + self.dy * normal_y
+        self.dx -= 2 * dot * normal_x
+        self.dy -= 2 * dot * normal_y
+
     def bounce_off_paddle(self, paddle):
         hit_pos = (self.rect.centerx - paddle.rect.left) / paddle.rect.width
         self.dx = (hit_pos - 0.5) * 2 * self.speed  # Adjust the ball's horizontal velocity
@@ -190,36 +715,160 @@ class Ball:
         if abs(self.dx) > max_speed:
             self.dx = max_speed if self.dx > 0 else -max_speed
 
-    def draw(self, screen):
-        pygame.draw.circle(screen, RED, (self.rect.x + BALL_RADIUS, self.rect.y + BALL_RADIUS), BALL_RADIUS)
+    def draw(self, screen, alpha=1.0):
+        return draw_balls(screen, [self], alpha)[0]
+
+ball_pool = Pool(Ball)
+
+# Time of impact of a circle moving by (dx, dy) against a rect during one step.
+# Returns (t, normal_x, normal_y) with t in [0, 1], or None if the circle doesn't strike the rect.
+def sweep_circle_rect(cx, cy, radius, dx, dy, rect):
+    # Ray cast against the rect grown by the radius on every side
+    t_enter, t_exit, axis = float('-inf'), float('inf'), None
+    for c, d, low, high, name in ((cx, dx, rect.left - radius, rect.right + radius, 'x'),
+                                  (cy, dy, rect.top - radius, rect.bottom + radius, 'y')):
+        if d == 0:
+            if c <= low or c >= high:
+                return None
+            continue
+        t1, t2 = (low - c) / d, (high - c) / d
+        if t1 > t2:
+            t1, t2 = t2, t1
+        if t1 > t_enter:
+            t_enter, axis = t1, name
+        t_exit = min(t_exit, t2)
+    if t_enter >= t_exit or t_exit <= 0 or t_enter > 1:
+        return None
+
+    if t_enter < 0:
+        # Already overlapping: push out along the shallowest axis, but only if still moving inward
+        near_x = min(max(cx, rect.left), rect.right)
+        near_y = min(max(cy, rect.top), rect.bottom)
+        offset_x, offset_y = cx - near_x, cy - near_y
+        if offset_x and offset_y and offset_x * offset_x + offset_y * offset_y >= radius * radius:
+            return sweep_circle_corner(cx, cy, radius, dx, dy, near_x, near_y)
+        if offset_x or offset_y:
+            length = (offset_x * offset_x + offset_y * offset_y) ** 0.5
+            normal_x, normal_y = offset_x / length, offset_y / length
+        elif min(cx - rect.left, rect.right - cx) < min(cy - rect.top, rect.bottom - cy):
+            normal_x, normal_y = (-1 if cx - rect.left < rect.right - cx else 1), 0
+        else:
+            normal_x, normal_y = 0, (-1 if cy - rect.top < rect.bottom - cy else 1)
+        if dx * normal_x + dy * normal_y >= 0:
+            return None
+        return 0.0, normal_x, normal_y
+
+    # Entry points beyond both faces of a corner actually meet the rounded corner, not the grown box
+    hit_x, hit_y = cx + dx * t_enter, cy + dy * t_enter
+    corner_x = rect.left if hit_x < rect.left else rect.right if hit_x > rect.right else None
+    corner_y = rect.top if hit_y < rect.top else rect.bottom if hit_y > rect.bottom else None
+    if corner_x is not None and corner_y is not None:
+        return sweep_circle_corner(cx, cy, radius, dx, dy, corner_x, corner_y)
+    if axis == 'x':
+        return t_enter, (-1 if dx > 0 else 1), 0
+    return t_enter, 0, (-1 if dy > 0 else 1)
+
+# Time of impact of a moving circle against a single corner point
+def sweep_circle_corner(cx, cy, radius, dx, dy, corner_x, corner_y):
+    offset_x, offset_y = cx - corner_x, cy - corner_y
+    a = dx * dx + dy * dy
+    b = 2 * (offset_x * dx + offset_y * dy)
+    c = offset_x * offset_x + offset_y * offset_y - radius * radius
+    discriminant = b * b - 4 * a * c
+    if a == 0 or discriminant < 0 or b >= 0:
+        return None
+    t = (-b - discriminant ** 0.5) / (2 * a)
+    if t < 0 or t > 1:
+        return None
+    normal_x = (offset_x + dx * t) / radius
+    normal_y = (offset_y + dy * t) / radius
+    return t, normal_x, normal_y
+
+# A kind of power-up: the chance a destroyed brick drops it, its color, and what catching it does
+class PowerUpKind:
+    __slots__ = ('name', 'chance', 'color', 'apply')
+
+    def __init__(self, name, chance, color, apply):
+        self.name = name
+        self.chance = chance
+        self.color = color
+        self.apply = apply  # Called with the game state when the paddle catches the power-up
+
+# Every power-up kind the game knows about. A new kind only has to be registered to drop, draw and work.
+class PowerUpRegistry:
+    def __init__(self):
+        self.kinds = {}  # name -> PowerUpKind, in registration order
+        self.names = []
+        self.thresholds = []  # Running total of the chances, for a single weighted roll
+
+    def register(self, name, chance, color, apply):
+        self.kinds[name] = PowerUpKind(name, chance, color, apply)
+        self.update()
+
+    def set_chance(self, name, chance):
+        self.kinds[name].chance = chance
+        self.update()
+
+    def update(self):
+        self.names, self.thresholds = self.table({name: kind.chance for name, kind in self.kinds.items()})
+
+    def table(self, chances):
+        # Names and running totals of the chances for a weighted roll, from {kind name: chance}
+        names, thresholds, total = [], [], 0.0
+        for name, chance in chances.items():
+            if name not in self.kinds:
+                raise ValueError(f"unknown power-up {name!r}")
+            total += chance
+            names.append(name)
+            thresholds.append(total)
+        if total > 1:
+            raise ValueError(f"power-up chances add up to {total}, more than 1")
+        return names, thresholds
+
+    def roll(self, rng, table=None):
+        # The power-up a destroyed brick drops, or None, from one random number. table overrides the
+        # registered chances, as a level's power-up table does.
+        names, thresholds = table or (self.names, self.thresholds)
+        index = bisect.bisect_right(thresholds, rng.random())
+        return names[index] if index < len(names) else None
+
+power_up_registry = PowerUpRegistry()
 
 # Power-up class
 class PowerUp:
+    __slots__ = ('rect', 'type', 'active', 'prev_y')
+
     def __init__(self, x, y, power_up_type):
         self.rect = pygame.Rect(x, y, POWER_UP_SIZE, POWER_UP_SIZE)
-        self.type = power_up_type  # 'expand', 'extra_ball', 'additional_bricks', 'remove_balls', or 'shooting'
+        self.setup(x, y, power_up_type)
+
+    def setup(self, x, y, power_up_type):
+        self.rect.topleft = (x, y)
+        self.type = power_up_type  # Name of a kind in power_up_registry
         self.active = True
+        self.remember_position()
+
+    def remember_position(self):
+        self.prev_y = self.rect.y
 
     def move(self):
         self.rect.y += POWER_UP_SPEED
 
-    def draw(self, screen):
-        if self.type == 'expand':
-            color = BLUE
-        elif self.type == 'extra_ball':
-            color = ORANGE
-        elif self.type == 'additional_bricks':
-            color = WHITE
-        elif self.type == 'remove_balls':
-            color = PURPLE
-        elif self.type == 'shooting':
-            color = BLACK
-        pygame.draw.rect(screen, color, self.rect)
+    def draw(self, screen, alpha=1.0):
+        return draw_power_ups(screen, [self], alpha)[0]
+
+power_up_pool = Pool(PowerUp)
 
 # Brick class
 class Brick:
-    def __init__(self, x, y, color, requires_two_hits, flashing=False):
-        self.rect = pygame.Rect((x, y), (BRICK_WIDTH, BRICK_HEIGHT))
+    __slots__ = ('rect', 'color', 'requires_two_hits', 'hit', 'flashing', 'flash_timer', 'flash_interval')
+
+    def __init__(self, x, y, color, requires_two_hits, flashing=False, width=BRICK_WIDTH, height=BRICK_HEIGHT):
+        self.rect = pygame.Rect((x, y), (width, height))
+        self.setup(x, y, color, requires_two_hits, flashing, width, height)
+
+    def setup(self, x, y, color, requires_two_hits, flashing=False, width=BRICK_WIDTH, height=BRICK_HEIGHT):
+        self.rect.update(x, y, width, height)
         self.color = color
         self.requires_two_hits = requires_two_hits
         self.hit = False
@@ -227,26 +876,13 @@ class Brick:
         self.flash_timer = 0
         self.flash_interval = 500  # Flash every 500ms
 
-        power_up_type = None
-        if random.random() < EXPAND_POWER_UP_CHANCE:
-            power_up_type = 'expand'
-        elif random.random() < EXTRA_BALL_POWER_UP_CHANCE:
-            power_up_type = 'extra_ball'
-        elif random.random() < ADDITIONAL_BRICKS_POWER_UP_CHANCE:
-            power_up_type = 'additional_bricks'
-        elif random.random() < REMOVE_BALLS_POWER_UP_CHANCE:
-            power_up_type = 'remove_balls'
-        elif random.random() < SHOOTING_POWER_UP_CHANCE:
-            power_up_type = 'shooting'
-        self.power_up = PowerUp(x + BRICK_WIDTH // 2 - POWER_UP_SIZE // 2, y, power_up_type) if power_up_type else None
-
     def draw(self, screen):
         if self.flashing:
             current_time = pygame.time.get_ticks()
             if current_time - self.flash_timer > self.flash_interval:
                 self.flash_timer = current_time
                 self.color = RED if self.color == WHITE else WHITE
-        pygame.draw.rect(screen, self.color, self.rect)
+        return pygame.draw.rect(screen, self.color, self.rect)
 
     def hit_brick(self):
         if self.requires_two_hits:
@@ -258,52 +894,397 @@ class Brick:
         else:
             return True  # Brick is destroyed
 
+    def release_power_up(self, power_up_type):
+        return power_up_pool.acquire(self.rect.centerx - POWER_UP_SIZE // 2, self.rect.y, power_up_type)
+
+brick_pool = Pool(Brick)
+
+# Uniform grid index of bricks so collision checks only look at nearby cells
+class BrickGrid:
+    def __init__(self, bricks=()):
+        self.bricks = {}  # brick -> cells it occupies, kept in insertion order
+        self.cells = {}   # (col, row) -> {brick: None}
+        self.extend(bricks)
+
+    def _cells_for(self, rect):
+        first_col = rect.left // GRID_CELL_WIDTH
+        last_col = (rect.right - 1) // GRID_CELL_WIDTH
+        first_row = rect.top // GRID_CELL_HEIGHT
+        last_row = (rect.bottom - 1) // GRID_CELL_HEIGHT
+        return [(col, row) for row in range(first_row, last_row + 1) for col in range(first_col, last_col + 1)]
+
+    def add(self, brick):
+        cells = self._cells_for(brick.rect)
+        self.bricks[brick] = cells
+        for cell in cells:
+            self.cells.setdefault(cell, {})[brick] = None
+
+    def extend(self, bricks):
+        for brick in bricks:
+            self.add(brick)
+
+    def remove(self, brick):
+        for cell in self.bricks.pop(brick):
+            bucket = self.cells[cell]
+            del bucket[brick]
+            if not bucket:
+                del self.cells[cell]
+
+    def query(self, rect):
+        # Return the bricks colliding with rect, checking only the cells it overlaps
+        found = {}
+        for cell in self._cells_for(rect):
+            bucket = self.cells.get(cell)
+            if bucket:
+                for brick in bucket:
+                    if brick not in found and rect.colliderect(brick.rect):
+                        found[brick] = None
+        return list(found)
+
+    def __iter__(self):
+        return iter(self.bricks)
+
+    def __len__(self):
+        return len(self.bricks)
+
+    def __contains__(self, brick):
+        return brick in self.bricks
+
+# Offscreen layer holding every non-flashing brick, so static bricks cost one blit per frame.
+# Flashing bricks change color on a timer and are drawn on top each frame instead.
+class BrickLayer:
+    def __init__(self):
+        # Display format with a colorkey for the gaps, which blits far faster than per-pixel alpha. Bricks are
+        # painted and partial blits taken from this surface; whole-layer blits come from an RLE copy of it, made
+        # once the layer has stopped changing, since RLE surfaces are slow to modify and to blit parts of.
+        self.surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        if pygame.display.get_surface() is not None:
+            self.surface = self.surface.convert()
+        self.surface.set_colorkey(SPRITE_COLORKEY)
+        self.static_surface = None
+        self.changed = True  # Since the last whole-layer blit
+        self.bricks = None
+        self.animate_flashing = True  # When off, flashing bricks are drawn into the layer like the rest
+        self.flashing = {}
+        self.invalid_rects = []
+
+    def invalidate(self, rect):
+        # Queue the area of a brick that was cracked, destroyed or added for repainting
+        self.invalid_rects.append(pygame.Rect(rect))
+
+    def set_animate_flashing(self, animate):
+        if animate != self.animate_flashing:
+            self.animate_flashing = animate
+            self.bricks = None  # Rebuilt on the next draw
+
+    def rebuild(self, bricks):
+        self.bricks = bricks
+        self.flashing = {}
+        self.invalid_rects = []
+        self.static_surface = None
+        self.changed = True
+        self.surface.fill(SPRITE_COLORKEY)
+        for brick in bricks:
+            if brick.flashing and self.animate_flashing:
+                self.flashing[brick] = None
+            else:
+                brick.draw(self.surface)
+
+    def repaint(self, rect):
+        self.static_surface = None
+        self.changed = True
+        self.surface.fill(SPRITE_COLORKEY, rect)
+        self.surface.set_clip(rect)
+        for brick in self.bricks.query(rect):
+            if brick.flashing and self.animate_flashing:
+                self.flashing[brick] = None
+            else:
+                brick.draw(self.surface)
+        self.surface.set_clip(None)
+
+    def draw(self, screen, bricks, areas=None):
+        # Blit the layer (only the given areas if any) and the flashing bricks; returns the flashing brick rects
+        if bricks is not self.bricks:
+            self.rebuild(bricks)
+        for rect in self.invalid_rects:
+            self.repaint(rect)
+        self.invalid_rects = []
+
+        if areas is None:
+            if self.static_surface is None and not self.changed:
+                self.static_surface = self.surface.copy()
+                self.static_surface.set_colorkey(SPRITE_COLORKEY, RLEACCEL)
+            screen.blit(self.static_surface or self.surface, (0, 0))
+            self.changed = False
+        else:
+            for rect in areas:
+                screen.blit(self.surface, rect, rect)
+        drawn = []
+        for brick in list(self.flashing):
+            if brick in bricks and brick.flashing:
+                drawn.append(brick.draw(screen))
+            else:
+                del self.flashing[brick]
+        return drawn
+
+# Redraws only the parts of the screen that changed since the last frame during play
+class DirtyRectRenderer:
+    def __init__(self, screen, brick_layer):
+        self.screen = screen
+        self.brick_layer = brick_layer
+        self.background = None
+        self.previous_rects = []  # Where sprites were drawn last frame
+        self.invalid_rects = []   # Bricks that changed since last frame
+        self.full_redraw = True
+
+    def invalidate(self, rect=None):
+        # Queue a region, or the whole screen when rect is None, to be restored on the next frame
+        if rect is None:
+            self.full_redraw = True
+        else:
+            self.invalid_rects.append(pygame.Rect(rect))
+            self.brick_layer.invalidate(rect)
+
+    def draw(self, background, paddle, balls, bricks, power_ups, score, alpha=1.0, overlay=None):
+        # Draw the frame and return the rects to push to the display, or None if the whole screen changed
+        screen = self.screen
+        if background is not self.background:
+            self.background = background
+            self.full_redraw = True
+
+        # With no background image (the governor's no-background tier) the screen is cleared to black
+        if self.full_redraw:
+            restored = [screen.get_rect()]
+            if background is None:
+                screen.fill(BLACK)
+            else:
+                screen.blit(background, (0, 0))
+        else:
+            restored = self.previous_rects + self.invalid_rects
+            for rect in restored:
+                if background is None:
+                    screen.fill(BLACK, rect)
+                else:
+                    screen.blit(background, rect, rect)
+
+        # Same layering as a full frame: paddle and balls, then bricks, then power-ups
+        sprites = [paddle.draw(screen, score, alpha)]
+        sprites += draw_balls(screen, balls, alpha)
+        if self.full_redraw:
+            self.brick_layer.draw(screen, bricks)
+        else:
+            restored += self.brick_layer.draw(screen, bricks, restored + sprites)
+        sprites += draw_power_ups(screen, power_ups, alpha)
+        if overlay:
+            sprites.append(overlay(screen))
+
+        dirty_rects = None if self.full_redraw else restored + sprites
+        self.previous_rects = sprites
+        self.invalid_rects = []
+        self.full_redraw = False
+        return dirty_rects
+
 # Create bricks
-def create_bricks(color):
+def create_bricks(color, rng=random):
+    return classic_level(color, rng).build()
+
+# The built-in wall: BRICK_ROWS x BRICK_COLUMNS bricks of one color, each with an even chance of needing two hits
+def classic_level(color, rng=random):
+    color = BRICK_COLORS.index(color)
     bricks = []
     for row in range(BRICK_ROWS):
         for col in range(BRICK_COLUMNS):
             x = col * (BRICK_WIDTH + BRICK_PADDING) + BRICK_PADDING
             y = row * (BRICK_HEIGHT + BRICK_PADDING) + BRICK_PADDING
-            requires_two_hits = random.choice([True, False])  # Randomly assign bricks to require two hits
-            bricks.append(Brick(x, y, color, requires_two_hits))
-    return bricks
+            hits = 2 if rng.choice([True, False]) else 1  # Randomly assign bricks to require two hits
+            bricks.append((x, y, hits, color))
+    return Level(bricks)
 
 # Create flashing bricks without overlapping existing bricks
-def create_flashing_bricks(count, existing_bricks):
+# Spawned bricks go in slots below the starting wall, on a brick-plus-padding lattice so slots never overlap
+SPAWN_AREA_TOP = BRICK_ROWS * (BRICK_HEIGHT + BRICK_PADDING) + BRICK_PADDING
+SPAWN_COLUMNS = (SCREEN_WIDTH - BRICK_WIDTH) // GRID_CELL_WIDTH + 1
+SPAWN_ROWS = (SCREEN_HEIGHT - BRICK_HEIGHT - SPAWN_AREA_TOP) // GRID_CELL_HEIGHT + 1
+SPAWN_AREA = pygame.Rect(0, SPAWN_AREA_TOP, SCREEN_WIDTH, SCREEN_HEIGHT - SPAWN_AREA_TOP)
+
+def spawn_positions(count, existing_bricks, rng=random):
+    # Mark the slots each brick in the spawn area touches, then draw the positions from the free ones
+    taken = bytearray(SPAWN_COLUMNS * SPAWN_ROWS)
+    for brick in existing_bricks.query(SPAWN_AREA):
+        rect = brick.rect
+        first_col = max(0, (rect.left - BRICK_WIDTH) // GRID_CELL_WIDTH + 1)
+        last_col = min(SPAWN_COLUMNS - 1, (rect.right - 1) // GRID_CELL_WIDTH)
+        first_row = max(0, (rect.top - SPAWN_AREA_TOP - BRICK_HEIGHT) // GRID_CELL_HEIGHT + 1)
+        last_row = min(SPAWN_ROWS - 1, (rect.bottom - 1 - SPAWN_AREA_TOP) // GRID_CELL_HEIGHT)
+        for row in range(first_row, last_row + 1):
+            for col in range(first_col, last_col + 1):
+                taken[row * SPAWN_COLUMNS + col] = 1
+    free = [slot for slot, used in enumerate(taken) if not used]
+    return [(slot % SPAWN_COLUMNS * GRID_CELL_WIDTH, SPAWN_AREA_TOP + slot // SPAWN_COLUMNS * GRID_CELL_HEIGHT)
+            for slot in rng.sample(free, min(count, len(free)))]
+
+def create_flashing_bricks(count, existing_bricks, rng=random):
+    return [brick_pool.acquire(x, y, WHITE, True, flashing=True) for x, y in spawn_positions(count, existing_bricks, rng)]
+
+def create_additional_bricks(count, existing_bricks, current_color, rng=random):
+    new_color = rng.choice([color for color in BRICK_COLORS if color != current_color])
+    return [brick_pool.acquire(x, y, new_color, False) for x, y in spawn_positions(count, existing_bricks, rng)]
+
+# A board layout: where each brick goes, how many hits it takes and its color, plus optional
+# per-level power-up chances that replace the registered ones.
+class Level:
+    def __init__(self, bricks, brick_size=(BRICK_WIDTH, BRICK_HEIGHT), power_ups=None, name=None):
+        self.bricks = bricks  # (x, y, hits, index into BRICK_COLORS) per brick
+        self.brick_size = tuple(brick_size)
+        self.power_ups = power_ups  # {power-up name: chance}, or None for the registered chances
+        self.name = name
+        self.power_up_table = power_up_registry.table(power_ups) if power_ups else None
+
+    def build(self):
+        width, height = self.brick_size
+        bricks = BrickGrid()
+        for x, y, hits, color in self.bricks:
+            bricks.add(brick_pool.acquire(x, y, BRICK_COLORS[color], hits > 1, width=width, height=height))
+        return bricks
+
+    def to_json(self):
+        level = {'name': self.name, 'brick_size': list(self.brick_size), 'power_ups': self.power_ups,
+                 'bricks': [list(brick) for brick in self.bricks]}
+        return json.dumps({key: value for key, value in level.items() if value is not None}, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, text):
+        # One level per line in a pack: {"name": ..., "brick_size": [w, h], "power_ups": {...}, "bricks": [[x, y, hits, color], ...]}
+        level = json.loads(text)
+        bricks = [tuple(brick) for brick in level['bricks']]
+        for x, y, hits, color in bricks:
+            if hits not in (1, 2) or not 0 <= color < len(BRICK_COLORS):
+                raise ValueError(f"bad brick {[x, y, hits, color]}: hits must be 1 or 2 and color an index into BRICK_COLORS")
+        return cls(bricks, level.get('brick_size', (BRICK_WIDTH, BRICK_HEIGHT)), level.get('power_ups'), level.get('name'))
+
+# A left-right symmetric board of small bricks filling the area above the spawn area. The same rng
+# state always gives the same board, and the power-up chances are scaled so a board of any size
+# drops about PROCEDURAL_POWER_UPS_PER_LEVEL power-ups.
+def generate_level(rng, rows=PROCEDURAL_ROWS, columns=PROCEDURAL_COLUMNS, name=None):
+    padding = PROCEDURAL_PADDING
+    width = (SCREEN_WIDTH - padding) // columns - padding
+    height = (SPAWN_AREA_TOP - padding) // rows - padding
+    if width < 1 or height < 1:
+        raise ValueError(f"{rows} x {columns} bricks don't fit above the spawn area")
+    row_colors = [rng.randrange(len(BRICK_COLORS)) for _ in range(rows)]
     bricks = []
-    attempts = 0
-    while len(bricks) < count and attempts < 1000:  # Limit attempts to prevent infinite loop
-        x = random.randint(0, SCREEN_WIDTH - BRICK_WIDTH)
-        y = random.randint(BRICK_ROWS * (BRICK_HEIGHT + BRICK_PADDING) + BRICK_PADDING, SCREEN_HEIGHT - BRICK_HEIGHT)
-        new_brick = Brick(x, y, WHITE, True, flashing=True)
-        overlap = False
-        for brick in existing_bricks + bricks:
-            if new_brick.rect.colliderect(brick.rect):
-                overlap = True
-                break
-        if not overlap:
-            bricks.append(new_brick)
-        attempts += 1
-    return bricks
-
-def create_additional_bricks(count, existing_bricks, current_color):
-    bricks = []
-    attempts = 0
-    new_color = random.choice([color for color in BRICK_COLORS if color != current_color])
-    while len(bricks) < count and attempts < 1000:  # Limit attempts to prevent infinite loop
-        x = random.randint(0, SCREEN_WIDTH - BRICK_WIDTH)
-        y = random.randint(BRICK_ROWS * (BRICK_HEIGHT + BRICK_PADDING) + BRICK_PADDING, SCREEN_HEIGHT - BRICK_HEIGHT)
-        new_brick = Brick(x, y, new_color, False)
-        overlap = False
-        for brick in existing_bricks + bricks:
-            if new_brick.rect.colliderect(brick.rect):
-                overlap = True
-                break
-        if not overlap:
-            bricks.append(new_brick)
-        attempts += 1
-    return bricks
+    for row in range(rows):
+        y = padding + row * (height + padding)
+        for col in range((columns + 1) // 2):
+            if rng.random() >= PROCEDURAL_DENSITY:
+                continue
+            hits = 2 if rng.random() < PROCEDURAL_TWO_HIT_SHARE else 1
+            for mirrored in sorted({col, columns - 1 - col}):
+                bricks.append((padding + mirrored * (width + padding), y, hits, row_colors[row]))
+    scale = min(1.0, PROCEDURAL_POWER_UPS_PER_LEVEL / max(1, len(bricks)) / max(power_up_registry.thresholds[-1], 1e-9))
+    power_ups = {name: kind.chance * scale for name, kind in power_up_registry.kinds.items()}
+    return Level(bricks, (width, height), power_ups, name)
+
+# Levels that don't depend on the game's RNG are parsed or generated ahead of time on this thread
+level_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='levels')
+
+# Where a game's levels come from. get() returns (level, bricks), handing over a level that was
+# prefetched, with its bricks already built, in the background if there is one.
+class LevelSource(ABC):
+    spec = None  # What open_levels() takes to give this source back
+
+    def __init__(self):
+        self.pending = {}  # level number -> future
+
+    @abstractmethod
+    def load(self, number):
+        # The Level for a level number
+        ...
+
+    def prepare(self, number):
+        level = self.load(number)
+        return level, level.build()
+
+    def prefetch(self, number):
+        if number not in self.pending:
+            self.pending[number] = level_executor.submit(self.prepare, number)
+
+    def get(self, number, rng):
+        future = self.pending.pop(number, None)
+        return future.result() if future else self.prepare(number)
+
+# The built-in wall, cycling through the brick colors. It uses the game's RNG, so it is built on demand.
+class ClassicLevels(LevelSource):
+    def load(self, number, rng=random):
+        # Without the game's RNG the wall's two-hit bricks come from the shared random module
+        return classic_level(BRICK_COLORS[number % len(BRICK_COLORS)], rng)
+
+    def prefetch(self, number):
+        pass
+
+    def get(self, number, rng):
+        level = self.load(number, rng)
+        return level, level.build()
+
+# Levels read one line at a time from a pack file with one JSON level per line. The file is only
+# scanned as far as the levels asked for, and play loops back to the first level after the last.
+class LevelPack(LevelSource):
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.spec = path
+        self.offsets = []  # Byte offset of each level found so far
+        self.scanned = 0   # Bytes of the file scanned for levels
+        self.complete = False
+        self.lock = threading.Lock()
+
+    def scan(self, number):
+        with open(self.path, 'rb') as file:
+            file.seek(self.scanned)
+            while len(self.offsets) <= number:
+                line = file.readline()
+                if not line:
+                    self.complete = True
+                    break
+                if line.strip():
+                    self.offsets.append(self.scanned)
+                self.scanned += len(line)
+
+    def load(self, number):
+        with self.lock:
+            if len(self.offsets) <= number and not self.complete:
+                self.scan(number)
+            if not self.offsets:
+                raise ValueError(f"{self.path} has no levels")
+            offset = self.offsets[number % len(self.offsets)]
+        with open(self.path, 'rb') as file:
+            file.seek(offset)
+            return Level.from_json(file.readline())
+
+# Generated boards; level n of a given seed is always the same board
+class ProceduralLevels(LevelSource):
+    def __init__(self, seed=0, rows=PROCEDURAL_ROWS, columns=PROCEDURAL_COLUMNS):
+        super().__init__()
+        self.seed = seed
+        self.spec = f"procedural:{seed}"
+        self.rows = rows
+        self.columns = columns
+
+    def load(self, number):
+        return generate_level(random.Random(f"{self.seed}:{number}"), self.rows, self.columns, f"procedural {self.seed}:{number}")
+
+CLASSIC_LEVELS = ClassicLevels()
+
+# Level source for a BRICKS_LEVELS-style spec: a pack path, "procedural" or "procedural:<seed>", or None for the built-in wall
+def open_levels(spec):
+    if not spec:
+        return CLASSIC_LEVELS
+    if spec == 'procedural' or spec.startswith('procedural:'):
+        return ProceduralLevels(int(spec.partition(':')[2] or 0))
+    return LevelPack(spec)
+
+def write_level_pack(path, levels):
+    write_atomic(path, ''.join(level.to_json() + '\n' for level in levels))
 
 def find_highest_ball(balls):
     highest_ball = balls[0]
@@ -317,6 +1298,127 @@ def format_time(seconds):
     seconds = int(seconds % 60)
     return f"{minutes} min {seconds} sec"
 
+# Append-only score log with a per-difficulty top-N index that is kept up to date as scores are added
+class ScoreStore:
+    def __init__(self, path=SCORES_FILE, index_path=SCORES_INDEX_FILE, legacy_path=LEGACY_SCORES_FILE, top_n=HIGH_SCORES_SHOWN):
+        self.path = path
+        self.index_path = index_path
+        self.legacy_path = legacy_path
+        self.top_n = top_n
+        self.top = None  # difficulty -> best entries, highest score first
+        self.offset = 0  # Bytes of the log already folded into the index
+
+    def migrate(self):
+        # One-time conversion of the old whole-file JSON list into the log
+        if os.path.exists(self.path) or not os.path.exists(self.legacy_path):
+            return
+        with open(self.legacy_path, "r") as file:
+            entries = json.load(file)
+        write_atomic(self.path, "".join(json.dumps(entry) + "\n" for entry in entries))
+
+    def load(self):
+        if self.top is not None:
+            return
+        self.migrate()
+        self.top, self.offset = {}, 0
+        try:
+            with open(self.index_path, "r") as file:
+                index = json.load(file)
+            self.top = {int(difficulty): entries for difficulty, entries in index["top"].items()}
+            self.offset = index["offset"]
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            self.top, self.offset = {}, 0
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < self.offset:
+            self.top, self.offset = {}, 0  # Index doesn't match the log, rebuild it
+
+        # Fold in anything appended since the index was written
+        if os.path.exists(self.path) and os.path.getsize(self.path) > self.offset:
+            with open(self.path, "rb") as file:
+                file.seek(self.offset)
+                for line in file:
+                    if not line.endswith(b"\n"):
+                        break  # Torn write from a crash; it is ignored until a newline completes it
+                    self.offset += len(line)
+                    try:
+                        self.insert(json.loads(line))
+                    except (ValueError, KeyError, TypeError):
+                        continue  # Not JSON, or not a score entry
+            self.save_index()
+
+    def insert(self, entry):
+        # Raises KeyError or TypeError, before the index is touched, for anything that isn't a score entry
+        if not isinstance(entry, dict):
+            raise TypeError(f"score entry is a {type(entry).__name__}, not an object")
+        missing = SCORE_FIELDS - entry.keys()
+        if missing:
+            raise KeyError(min(missing))
+        score = -entry["score"]
+        entries = self.top.setdefault(entry["difficulty"], [])
+        # Equal scores keep the order they were logged in, like a stable sort
+        position = bisect.bisect_right([-e["score"] for e in entries], score)
+        if position < self.top_n:
+            entries.insert(position, entry)
+            del entries[self.top_n:]
+
+    def save_index(self):
+        write_atomic(self.index_path, json.dumps({"offset": self.offset, "top": self.top}))
+
+    def add(self, entry):
+        self.load()
+        line = (json.dumps(entry) + "\n").encode()
+        with open(self.path, "ab") as file:
+            if file.tell() > self.offset:
+                file.truncate(self.offset)  # Drop a torn line left by a crash before appending after it
+            file.write(line)
+            file.flush()
+            os.fsync(file.fileno())
+        self.offset += len(line)
+        self.insert(entry)
+        self.save_index()
+
+    def high_scores(self, difficulty):
+        self.load()
+        return list(self.top.get(difficulty, []))
+
+# Replace a file's contents so that readers see either the old or the new version, never a partial one
+def write_atomic(path, data):
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb" if isinstance(data, bytes) else "w") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+score_store = ScoreStore()
+
+# Runs jobs on a worker thread and hands their results back to callbacks run by the main loop
+class BackgroundWorker:
+    def __init__(self, name):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self.completed = queue.Queue()
+
+    def submit(self, callback, function, *args):
+        future = self.executor.submit(function, *args)
+        future.add_done_callback(lambda future: self.completed.put((callback, future)))
+
+    def run_callbacks(self):
+        # Called once per frame; re-raises any error from a job on the main thread
+        while True:
+            try:
+                callback, future = self.completed.get_nowait()
+            except queue.Empty:
+                return
+            result = future.result()
+            if callback:
+                callback(result)
+
+    def close(self):
+        # Wait for the jobs already submitted
+        self.executor.shutdown()
+
+score_worker = BackgroundWorker('scores')
+snapshot_worker = BackgroundWorker('snapshots')
+
 # Function to save the score
 def save_score(initials, score, total_time, difficulty):
     score_data = {
@@ -325,49 +1427,597 @@ def save_score(initials, score, total_time, difficulty):
         "total_time": format_time(total_time),
         "difficulty": difficulty
     }
-    if os.path.exists("scores.json"):
-        with open("scores.json", "r") as file:
-            data = json.load(file)
-    else:
-        data = []
-    data.append(score_data)
-    with open("scores.json", "w") as file:
-        json.dump(data, file, indent=4)
+    score_store.add(score_data)
 
 # Function to load high scores for a specific difficulty
 def load_high_scores(difficulty):
-    if os.path.exists("scores.json"):
-        with open("scores.json", "r") as file:
-            data = json.load(file)
-            return sorted([entry for entry in data if entry["difficulty"] == difficulty], key=lambda x: x["score"], reverse=True)[:10]
-    return []
+    return score_store.high_scores(difficulty)
+
+# Game state and rules, kept apart from the window so a game can be stepped headless
+class GameState:
+    def __init__(self, difficulty=2, level=0, seed=None, levels=None):
+        # All gameplay randomness comes from this seeded generator, so a seed plus the inputs reproduce a game exactly
+        self.seed = random.getrandbits(63) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        self.difficulty = difficulty
+        self.level = level
+        self.score = 0
+        self.total_time = 0  # Seconds of play, counted in physics steps
+        self.steps = 0
+        self.balls_lost = 0
+        self.power_ups_collected = 0
+        self.game_over = False
+        self.level_complete = False
+        self.left_pressed = False
+        self.right_pressed = False
+        self.sounds = []          # Sounds to play for the last step
+        self.changed_bricks = []  # Rects of bricks cracked, destroyed or added in the last step
+        self.destroyed_bricks = []  # Returned to the pool on the next step, once their rects have been used
+        self.ball_limit = None  # Most balls in play at once, set by the frame governor under load
+
+        paddle_width = PADDLE_BASE_WIDTH - (difficulty - 2) * 20  # Adjust the paddle size based on difficulty
+        self.paddle = Paddle(paddle_width)
+        ball = ball_pool.acquire(BALL_SPEEDS[difficulty], rng=self.rng)
+        ball.reset(self.paddle)
+        self.balls = [ball]
+        self.levels = levels or CLASSIC_LEVELS
+        self.load_level()
+        self.power_ups = []
+
+    def load_level(self):
+        level, self.bricks = self.levels.get(self.level, self.rng)
+        self.power_up_table = level.power_up_table
+
+    def remember_positions(self):
+        self.paddle.remember_position()
+        for ball in self.balls:
+            ball.remember_position()
+        for power_up in self.power_ups:
+            power_up.remember_position()
+
+# Release the balls waiting on the paddle
+def launch(state):
+    for ball in state.balls:
+        ball.attached = False
+
+# Fire a ball from the paddle if the shooting power-up has shots left
+def shoot(state):
+    paddle = state.paddle
+    if paddle.shooting_power and paddle.balls_to_shoot > 0 and not ball_limit_reached(state):
+        new_ball = ball_pool.acquire(BALL_SPEEDS[state.difficulty], paddle.rect.centerx - BALL_RADIUS, paddle.rect.top - BALL_RADIUS * 2, state.rng)
+        new_ball.bounce_off_paddle(paddle)
+        new_ball.attached = False
+        state.balls.append(new_ball)
+        paddle.balls_to_shoot -= 1
+        if paddle.balls_to_shoot == 0:
+            paddle.shooting_power = False
+
+def ball_limit_reached(state):
+    return state.ball_limit is not None and len(state.balls) >= state.ball_limit
+
+# Set up the board for the level reached, with a single ball already in play
+def start_next_level(state):
+    state.level_complete = False
+    state.paddle.reset_size()  # Reset paddle size at the end of the level
+    ball_pool.release_all(state.balls)
+    ball = ball_pool.acquire(BALL_SPEEDS[state.difficulty], rng=state.rng)
+    ball.reset(state.paddle)
+    ball.attached = False  # Ensure the ball moves immediately
+    state.balls[:] = [ball]
+    brick_pool.release_all(state.bricks)
+    state.load_level()
+    power_up_pool.release_all(state.power_ups)
+    state.power_ups.clear()  # Clear any remaining power-ups
+
+# Power-up effects, run when the paddle catches one
+def expand_paddle(state):
+    state.paddle.expand()
+
+def add_ball(state):
+    if ball_limit_reached(state):
+        return
+    paddle = state.paddle
+    new_ball = ball_pool.acquire(BALL_SPEEDS[state.difficulty], paddle.rect.centerx - BALL_RADIUS, paddle.rect.top - BALL_RADIUS * 2, state.rng)
+    new_ball.bounce_off_paddle(paddle)
+    new_ball.attached = False
+    state.balls.append(new_ball)
+
+def add_flashing_bricks(state):
+    new_bricks = create_flashing_bricks(5, state.bricks, state.rng)
+    state.bricks.extend(new_bricks)
+    state.changed_bricks.extend(brick.rect for brick in new_bricks)
+
+def remove_balls(state):
+    balls = state.balls
+    if len(balls) > 1:
+        highest_ball = find_highest_ball(balls)
+        ball_pool.release_all(ball for ball in balls if ball is not highest_ball)
+        balls[:] = [highest_ball]
+    else:
+        new_bricks = create_additional_bricks(3, state.bricks, BRICK_COLORS[state.level % len(BRICK_COLORS)], state.rng)
+        state.bricks.extend(new_bricks)
+        state.changed_bricks.extend(brick.rect for brick in new_bricks)
+    state.paddle.reset_size_based_on_difficulty(state.difficulty)
+
+def enable_shooting(state):
+    state.paddle.enable_shooting()
+
+power_up_registry.register('expand', EXPAND_POWER_UP_CHANCE, BLUE, expand_paddle)
+power_up_registry.register('extra_ball', EXTRA_BALL_POWER_UP_CHANCE, ORANGE, add_ball)
+power_up_registry.register('additional_bricks', ADDITIONAL_BRICKS_POWER_UP_CHANCE, WHITE, add_flashing_bricks)
+power_up_registry.register('remove_balls', REMOVE_BALLS_POWER_UP_CHANCE, PURPLE, remove_balls)
+power_up_registry.register('shooting', SHOOTING_POWER_UP_CHANCE, BLACK, enable_shooting)
+
+# Advance the game by one fixed physics step with the given paddle controls
+def step_game(state, left=False, right=False, profiler=None):
+    paddle, bricks = state.paddle, state.bricks
+    state.sounds.clear()
+    state.changed_bricks.clear()
+    brick_pool.release_all(state.destroyed_bricks)
+    state.destroyed_bricks.clear()
+    if state.game_over or state.level_complete:
+        return
+
+    # Letting go of a direction drops the paddle back to its base speed
+    if (state.left_pressed and not left) or (state.right_pressed and not right):
+        paddle.reset_speed()
+    state.left_pressed, state.right_pressed = left, right
+    if left:
+        paddle.accelerate()
+        paddle.move('left')
+    if right:
+        paddle.accelerate()
+        paddle.move('right')
+    if profiler:
+        profiler.mark('paddle')
+
+    for ball in state.balls:
+        hit_bricks = []
+        if ball.attached:
+            ball.rect.x = paddle.rect.centerx - BALL_RADIUS
+            ball.rect.y = paddle.rect.top - BALL_RADIUS * 2
+        else:
+            hit_bricks = ball.move(bricks)
+
+        # Ball collision with walls
+        if ball.rect.left <= 0:
+            ball.rect.left = 0
+            ball.bounce('x')
+        if ball.rect.right >= SCREEN_WIDTH:
+            ball.rect.right = SCREEN_WIDTH - ball.rect.width
+            ball.bounce('x')
+        if ball.rect.top <= 0:
+            ball.rect.top = 0
+            ball.bounce('y')
+
+        # Ball collision with paddle
+        if ball.rect.colliderect(paddle.rect) and not ball.attached:
+            ball.bounce_off_paddle(paddle)
+            state.sounds.append(paddle_hit_sound)
+
+        # Bricks struck while sweeping the ball, in time-of-impact order
+        for brick in hit_bricks:
+            state.sounds.append(brick_hit_sound)
+            state.score += 1  # Score 1 point for each brick broken
+            state.changed_bricks.append(brick.rect)
+            if brick.hit_brick():
+                power_up_type = power_up_registry.roll(state.rng, state.power_up_table)
+                if power_up_type:
+                    state.power_ups.append(brick.release_power_up(power_up_type))
+                    state.sounds.append(bonus_brick_sound)  # Play bonus sound when power-up brick is hit
+                bricks.remove(brick)
+                state.destroyed_bricks.append(brick)
+    if profiler:
+        profiler.mark('collision')
+
+    # Move power-ups, compacting the list in place as they are collected or fall off the screen
+    power_ups = state.power_ups
+    kept = 0
+    for power_up in power_ups:
+        power_up.move()
+        if power_up.rect.colliderect(paddle.rect):
+            power_up_registry.kinds[power_up.type].apply(state)
+            state.power_ups_collected += 1
+            power_up_pool.release(power_up)
+        elif power_up.rect.top >= SCREEN_HEIGHT:
+            power_up_pool.release(power_up)
+        else:
+            power_ups[kept] = power_up
+            kept += 1
+    del power_ups[kept:]
+
+    # Remove balls that fall below the screen
+    balls = state.balls
+    kept = 0
+    for ball in balls:
+        if ball.rect.top < SCREEN_HEIGHT:
+            balls[kept] = ball
+            kept += 1
+        else:
+            ball_pool.release(ball)
+    state.balls_lost += len(balls) - kept
+    del balls[kept:]
+    if profiler:
+        profiler.mark('power_ups')
+
+    state.steps += 1
+    state.total_time += PHYSICS_STEP
+
+    # Check if all balls are lost
+    if not state.balls:
+        state.game_over = True
+
+    # Check if all bricks are destroyed
+    if not bricks:
+        state.level_complete = True
+        state.level += 1
+        state.levels.prefetch(state.level)  # Ready the next board while the level complete screen is up
+
+# Per-tick input flags in a recorded session. One-off key actions are applied by the live game
+# when the key is pressed and by a replay at the start of the tick they were recorded with.
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_LAUNCH = 4
+INPUT_NEXT_LEVEL = 8
+INPUT_PAUSED = 16  # The game was paused for this tick, so nothing is stepped
+INPUT_SHOT_SHIFT = 5  # The top three bits count shots fired before the tick
+MAX_SHOTS_PER_TICK = 7
+
+SESSION_MAGIC = b'BRKS'
+SESSION_VERSION = 3
+SESSION_HEADER = struct.Struct('<4sBBQIII')  # magic, version, difficulty, seed, final score, final level, steps
+
+# A recorded game: its seed plus one input byte per physics tick, enough to replay it exactly
+class Session:
+    def __init__(self, difficulty, seed, ticks=None, score=0, level=0, steps=0):
+        self.difficulty = difficulty
+        self.seed = seed
+        self.ticks = bytearray() if ticks is None else ticks
+        self.score = score
+        self.level = level
+        self.steps = steps
+
+    def record(self, inputs):
+        self.ticks.append(inputs)
+
+    def save(self, path, state):
+        self.score, self.level, self.steps = state.score, state.level, state.steps
+        header = SESSION_HEADER.pack(SESSION_MAGIC, SESSION_VERSION, self.difficulty, self.seed, self.score, self.level, self.steps)
+        with open(path, 'wb') as file:
+            file.write(header + zlib.compress(bytes(self.ticks), 9))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as file:
+            data = file.read()
+        magic, version, difficulty, seed, score, level, steps = SESSION_HEADER.unpack_from(data)
+        if magic != SESSION_MAGIC or version != SESSION_VERSION:
+            raise ValueError(f"{path} is not a version {SESSION_VERSION} session recording")
+        ticks = bytearray(zlib.decompress(data[SESSION_HEADER.size:]))
+        return cls(difficulty, seed, ticks, score, level, steps)
+
+# Fire the shots queued for a tick
+def fire_queued_shots(state, inputs):
+    for _ in range(inputs >> INPUT_SHOT_SHIFT):
+        shoot(state)
+
+# Re-run a recorded session headless; on_step(tick, state) is called after every step
+def replay_session(session, on_step=None):
+    state = GameState(session.difficulty, seed=session.seed)
+    for tick, inputs in enumerate(session.ticks):
+        if inputs & INPUT_PAUSED:
+            continue
+        if inputs & INPUT_LAUNCH:
+            launch(state)
+        if inputs & INPUT_NEXT_LEVEL and state.level_complete:
+            start_next_level(state)
+        fire_queued_shots(state, inputs)
+        step_game(state, bool(inputs & INPUT_LEFT), bool(inputs & INPUT_RIGHT))
+        if on_step:
+            on_step(tick, state)
+    return state
+
+# A snapshot of a game is three byte strings: (state, rng, bricks). state holds the counters, paddle,
+# balls, power-ups, the level's power-up table and where its levels come from; rng holds the Mersenne
+# Twister words; bricks holds one record per brick in board order. The rng and brick parts rarely
+# change from one tick to the next, so keeping them apart keeps the deltas between ticks small.
+SNAPSHOT_MAGIC = b'BRKG'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_FILE_HEADER = struct.Struct('<4sBIII')  # magic, version, length of each part; the parts follow compressed
+# difficulty, level, score, total time, steps, balls lost, power-ups collected, flags, seed, gauss_next,
+# paddle x, y, width, original width, speed, base speed, previous x and shots left, then how many
+# balls, power-ups and power-up table entries follow, and the length of the level source spec at the end
+SNAPSHOT_STATE = struct.Struct('<BIIdIIIBQdhhhhhhhBHHBH')
+SNAPSHOT_BALL = struct.Struct('<hhddBhhh')  # x, y, dx, dy, attached, speed, previous x, previous y
+SNAPSHOT_POWER_UP = struct.Struct('<hhBh')  # x, y, kind (index into the registry), previous y
+SNAPSHOT_TABLE_ENTRY = struct.Struct('<Bd')  # kind, running total of the chances
+SNAPSHOT_BRICK = struct.Struct('<hhhh3BB')  # x, y, width, height, color, flags
+SNAPSHOT_RNG = struct.Struct('<625I')  # Mersenne Twister state words and position
+SNAPSHOT_GAME_OVER, SNAPSHOT_LEVEL_COMPLETE, SNAPSHOT_LEFT, SNAPSHOT_RIGHT, SNAPSHOT_SHOOTING, SNAPSHOT_GAUSS = (1 << i for i in range(6))
+SNAPSHOT_TWO_HITS, SNAPSHOT_HIT, SNAPSHOT_FLASHING = 1, 2, 4
+
+def pack_brick(brick):
+    flags = brick.requires_two_hits | brick.hit << 1 | brick.flashing << 2
+    return SNAPSHOT_BRICK.pack(*brick.rect, *brick.color, flags)
+
+# Takes snapshots of a game. Brick records are cached between snapshots and only the bricks the last
+# step cracked, destroyed or added are packed again, so a snapshot every tick stays cheap on big boards.
+class SnapshotEncoder:
+    def __init__(self):
+        self.bricks = None  # Board the cached records belong to
+        self.steps = None   # Steps the game had taken when they were last brought up to date
+        self.records = {}   # brick -> packed record, in board order
+
+    def invalidate(self):
+        # Drop the cached brick records; called when the game is replaced by a restored snapshot, whose
+        # step count can line up with the cache's while its bricks don't
+        self.bricks = self.steps = None
+        self.records = {}
+
+    def encode(self, state):
+        version, internal, gauss = state.rng.getstate()
+        return self.encode_state(state, gauss), SNAPSHOT_RNG.pack(*internal), self.encode_bricks(state)
+
+    def encode_state(self, state, gauss):
+        paddle = state.paddle
+        kinds = {name: index for index, name in enumerate(power_up_registry.kinds)}
+        table = state.power_up_table or ((), ())
+        spec = (state.levels.spec or '').encode()
+        flags = (state.game_over | state.level_complete << 1 | state.left_pressed << 2 | state.right_pressed << 3
+                 | paddle.shooting_power << 4 | (gauss is not None) << 5)
+        parts = [SNAPSHOT_STATE.pack(state.difficulty, state.level, state.score, state.total_time, state.steps,
+                                     state.balls_lost, state.power_ups_collected, flags, state.seed, gauss or 0.0,
+                                     paddle.rect.x, paddle.rect.y, paddle.rect.width, paddle.original_width,
+                                     paddle.current_speed, paddle.base_speed, paddle.prev_x, paddle.balls_to_shoot,
+                                     len(state.balls), len(state.power_ups), len(table[0]), len(spec))]
+        parts.extend([SNAPSHOT_BALL.pack(ball.rect.x, ball.rect.y, ball.dx, ball.dy, ball.attached, ball.speed,
+                                         ball.prev_x, ball.prev_y) for ball in state.balls])
+        parts.extend([SNAPSHOT_POWER_UP.pack(power_up.rect.x, power_up.rect.y, kinds[power_up.type], power_up.prev_y)
+                      for power_up in state.power_ups])
+        parts.extend([SNAPSHOT_TABLE_ENTRY.pack(kinds[name], threshold) for name, threshold in zip(*table)])
+        parts.append(spec)
+        return b''.join(parts)
+
+    def encode_bricks(self, state):
+        bricks, records = state.bricks, self.records
+        if bricks is not self.bricks or state.steps not in (self.steps, self.steps + 1):
+            pack = SNAPSHOT_BRICK.pack
+            records = self.records = {brick: pack(*brick.rect, *brick.color, brick.requires_two_hits | brick.hit << 1 | brick.flashing << 2)
+                                      for brick in bricks}
+        elif state.steps != self.steps:
+            for brick in state.destroyed_bricks:
+                records.pop(brick, None)
+            for rect in state.changed_bricks:
+                for brick in bricks.query(rect):
+                    records[brick] = pack_brick(brick)
+        self.bricks, self.steps = bricks, state.steps
+        return b''.join(records.values())
+
+# A new game in the state a snapshot was taken in. levels is where its later levels come from,
+# by default the source the snapshot names. bricks is a board to take over as it is, for callers that
+# know it holds the snapshot's bricks, since building a big board is most of the work.
+def restore_snapshot(snapshot, levels=None, bricks=None):
+    state_part, rng_part, brick_part = snapshot
+    (difficulty, level, score, total_time, steps, balls_lost, power_ups_collected, flags, seed, gauss,
+     paddle_x, paddle_y, paddle_width, original_width, current_speed, base_speed, prev_x, balls_to_shoot,
+     ball_count, power_up_count, table_count, spec_length) = SNAPSHOT_STATE.unpack_from(state_part)
+    offset = SNAPSHOT_STATE.size
+
+    # Everything GameState() would set up comes from the snapshot instead
+    state = GameState.__new__(GameState)
+    state.seed = seed
+    state.rng = random.Random(seed)
+    state.difficulty = difficulty
+    state.level = level
+    state.score = score
+    state.total_time = total_time
+    state.steps = steps
+    state.balls_lost = balls_lost
+    state.power_ups_collected = power_ups_collected
+    state.game_over = bool(flags & SNAPSHOT_GAME_OVER)
+    state.level_complete = bool(flags & SNAPSHOT_LEVEL_COMPLETE)
+    state.left_pressed = bool(flags & SNAPSHOT_LEFT)
+    state.right_pressed = bool(flags & SNAPSHOT_RIGHT)
+    state.sounds = []
+    state.changed_bricks = []
+    state.destroyed_bricks = []
+    state.ball_limit = None
+
+    paddle = state.paddle = Paddle(original_width)
+    paddle.rect.update(paddle_x, paddle_y, paddle_width, PADDLE_HEIGHT)
+    paddle.current_speed = current_speed
+    paddle.base_speed = base_speed
+    paddle.prev_x = prev_x
+    paddle.shooting_power = bool(flags & SNAPSHOT_SHOOTING)
+    paddle.balls_to_shoot = balls_to_shoot
+
+    state.balls = []
+    for _ in range(ball_count):
+        x, y, dx, dy, attached, speed, ball_prev_x, ball_prev_y = SNAPSHOT_BALL.unpack_from(state_part, offset)
+        offset += SNAPSHOT_BALL.size
+        ball = ball_pool.acquire(speed, x, y, state.rng)
+        ball.dx, ball.dy, ball.attached = dx, dy, bool(attached)
+        ball.prev_x, ball.prev_y = ball_prev_x, ball_prev_y
+        state.balls.append(ball)
+
+    names = list(power_up_registry.kinds)
+    state.power_ups = []
+    for _ in range(power_up_count):
+        x, y, kind, power_up_prev_y = SNAPSHOT_POWER_UP.unpack_from(state_part, offset)
+        offset += SNAPSHOT_POWER_UP.size
+        power_up = power_up_pool.acquire(x, y, names[kind])
+        power_up.prev_y = power_up_prev_y
+        state.power_ups.append(power_up)
+
+    state.power_up_table = None
+    if table_count:
+        entries = [SNAPSHOT_TABLE_ENTRY.unpack_from(state_part, offset + i * SNAPSHOT_TABLE_ENTRY.size) for i in range(table_count)]
+        offset += table_count * SNAPSHOT_TABLE_ENTRY.size
+        state.power_up_table = [names[kind] for kind, _ in entries], [threshold for _, threshold in entries]
+    state.levels = levels or open_levels(state_part[offset:offset + spec_length].decode())
+
+    state.bricks = bricks
+    if bricks is None:
+        state.bricks = BrickGrid()
+        for x, y, width, height, red, green, blue, brick_flags in SNAPSHOT_BRICK.iter_unpack(brick_part):
+            brick = brick_pool.acquire(x, y, (red, green, blue), bool(brick_flags & SNAPSHOT_TWO_HITS),
+                                       bool(brick_flags & SNAPSHOT_FLASHING), width, height)
+            brick.hit = bool(brick_flags & SNAPSHOT_HIT)
+            state.bricks.add(brick)
+
+    # Last, as setting the balls up above draws from the generator
+    state.rng.setstate((3, SNAPSHOT_RNG.unpack(rng_part), gauss if flags & SNAPSHOT_GAUSS else None))
+    return state
+
+# A snapshot as a compact file: a header giving the length of each part, then the parts compressed
+def pack_snapshot(snapshot):
+    header = SNAPSHOT_FILE_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, *map(len, snapshot))
+    return header + zlib.compress(b''.join(snapshot), 1)
+
+def unpack_snapshot(data):
+    magic, version, *lengths = SNAPSHOT_FILE_HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError(f"not a version {SNAPSHOT_VERSION} game snapshot")
+    body = zlib.decompress(data[SNAPSHOT_FILE_HEADER.size:])
+    if len(body) != sum(lengths):
+        raise ValueError("truncated game snapshot")
+    parts, offset = [], 0
+    for length in lengths:
+        parts.append(body[offset:offset + length])
+        offset += length
+    return tuple(parts)
+
+def save_snapshot(path, snapshot):
+    write_atomic(path, pack_snapshot(snapshot))
+
+def load_snapshot(path):
+    with open(path, 'rb') as file:
+        return unpack_snapshot(file.read())
+
+def discard_snapshot(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+# The change from one snapshot to the next, part by part: None for a part that is unchanged, otherwise
+# (prefix, suffix, middle) to keep the first prefix and last suffix bytes of the old part around middle
+def snapshot_delta(old, new):
+    return tuple(None if old_part == new_part else splice_delta(old_part, new_part) for old_part, new_part in zip(old, new))
+
+def splice_delta(old, new):
+    # Bytes in common at each end, found by XORing the ends as big integers
+    length = min(len(old), len(new))
+    differ = int.from_bytes(old[:length], 'big') ^ int.from_bytes(new[:length], 'big')
+    prefix = length - (differ.bit_length() + 7) // 8
+    length -= prefix
+    suffix = 0
+    if length:
+        differ = int.from_bytes(old[len(old) - length:], 'little') ^ int.from_bytes(new[len(new) - length:], 'little')
+        suffix = length - (differ.bit_length() + 7) // 8
+    return prefix, suffix, new[prefix:len(new) - suffix]
+
+def apply_delta(snapshot, delta):
+    return tuple(part if change is None else part[:change[0]] + change[2] + part[len(part) - change[1]:]
+                 for part, change in zip(snapshot, delta))
+
+def delta_size(delta):
+    return sum(len(change[2]) + 8 for change in delta if change is not None)
+
+# The last REWIND_SECONDS of play, one snapshot per tick, in bounded memory. Every
+# REWIND_KEYFRAME_INTERVAL-th entry is a whole snapshot and the rest are deltas from the tick before,
+# so any tick is rebuilt from a keyframe and at most that many deltas. Old ticks are dropped a
+# keyframe and its deltas at a time.
+class RewindBuffer:
+    def __init__(self, ticks=round(REWIND_SECONDS / PHYSICS_STEP), keyframe_interval=REWIND_KEYFRAME_INTERVAL,
+                 max_bytes=REWIND_BUFFER_BYTES):
+        self.ticks = ticks
+        self.keyframe_interval = keyframe_interval
+        self.max_bytes = max_bytes
+        self.clear()
+
+    def clear(self):
+        self.entries = deque()  # (is keyframe, snapshot or delta, bytes)
+        self.latest = None      # Snapshot of the newest entry
+        self.since_keyframe = 0  # Deltas after the newest keyframe
+        self.size = 0
+
+    def record(self, snapshot):
+        if self.latest is None or self.since_keyframe + 1 >= self.keyframe_interval:
+            entry = (True, snapshot, sum(map(len, snapshot)))
+            self.since_keyframe = 0
+        else:
+            delta = snapshot_delta(self.latest, snapshot)
+            entry = (False, delta, delta_size(delta))
+            self.since_keyframe += 1
+        self.entries.append(entry)
+        self.size += entry[2]
+        self.latest = snapshot
+        while (len(self.entries) > self.ticks or self.size > self.max_bytes) and len(self.entries) > self.since_keyframe + 1:
+            self.size -= self.entries.popleft()[2]
+            while not self.entries[0][0]:
+                self.size -= self.entries.popleft()[2]
+
+    def rewind(self, ticks=1):
+        # Drop the newest ticks and return the snapshot that is now newest, or None if there is nothing older
+        if len(self.entries) < 2:
+            return None
+        for _ in range(min(ticks, len(self.entries) - 1)):
+            self.size -= self.entries.pop()[2]
+        deltas = []
+        for is_keyframe, data, size in reversed(self.entries):
+            if is_keyframe:
+                break
+            deltas.append(data)
+        snapshot = data
+        for delta in reversed(deltas):
+            snapshot = apply_delta(snapshot, delta)
+        self.since_keyframe = len(deltas)
+        self.latest = snapshot
+        return snapshot
+
+# Bring up only what the windowed game needs, timing each stage. Returns {stage: seconds}.
+def startup():
+    global screen
+    timings = {}
+    last = time.perf_counter()
+
+    def stage(name):
+        nonlocal last
+        now = time.perf_counter()
+        timings[name] = now - last
+        last = now
+
+    pygame.display.init()
+    stage('display')
+    pygame.font.init()
+    stage('font')
+    audio.start()
+    stage('mixer')
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Brick Breaker")
+    stage('window')
+    atlas.build()
+    stage('sprites')
+    return timings
+
+def report_startup(timings):
+    profiler.startup = timings
+    if profiler.enabled:
+        stages = ', '.join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in timings.items())
+        print(f"startup {sum(timings.values()) * 1000:.1f} ms: {stages}")
 
 # Main game loop
 def main():
-    def new_game(level=0, difficulty=2):
-        color = BRICK_COLORS[level % len(BRICK_COLORS)]
-        global CRACKED_COLOR
-        CRACKED_COLOR = DARK_COLOR_MAP[color]  # Set cracked color based on the brick color
-        paddle_width = PADDLE_BASE_WIDTH - (difficulty - 2) * 20  # Adjust the paddle size based on difficulty
-        paddle = Paddle(paddle_width)
-        ball = Ball(BALL_SPEEDS[difficulty])
-        ball.reset(paddle)
-        background_image = pygame.image.load(random.choice(bg_images))
-        background_image = pygame.transform.scale(background_image, (SCREEN_WIDTH, SCREEN_HEIGHT))
-        return paddle, [ball], create_bricks(color), 0, level, difficulty, [], background_image
-
-    paddle, balls, bricks, score, level, difficulty, power_ups, background_image = None, None, None, 0, 0, 2, [], None
+    startup_timings = startup()
+    splash_start = time.perf_counter()
+    levels = open_levels(LEVELS)
+    state, background_image = None, None
     running = True
     game_over = False
     paused = False
     splash_screen = True
     waiting_to_start = False
     choosing_difficulty = True
-    level_complete = False
-
-    # Timer variables
-    total_time = 0
-    level_start_time = 0
+    difficulty = 2
 
     splash_text_colors = [RED, GREEN, BLUE, YELLOW, CYAN, MAGENTA, ORANGE, PURPLE]
     splash_text_index = 0
@@ -386,200 +2036,243 @@ def main():
     flash_text_interval = 500  # Time in milliseconds between color changes
 
     # Stationary text properties
-    font = pygame.font.Font(None, 74)
     text_x, text_y = SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 50
 
     left_pressed = False
     right_pressed = False
 
+    # Inputs for the next physics tick, and the recording of the current game if enabled
+    pending_input = 0
+    session = None
+
+    def save_session():
+        nonlocal session
+        if session and session.ticks:
+            os.makedirs(RECORD_DIR, exist_ok=True)
+            session.save(os.path.join(RECORD_DIR, f"session-{time.strftime('%Y%m%d-%H%M%S')}-{state.seed}.brs"), state)
+        session = None
+
+    # Snapshots of the game in play: every tick into the rewind buffer, and to SAVE_FILE when paused,
+    # every CHECKPOINT_INTERVAL seconds of play and on quitting, so it can be resumed from the splash screen
+    snapshots = SnapshotEncoder()
+    rewind = RewindBuffer()
+    rewinding = False
+    checkpoint_time = 0.0
+    saved_game = os.path.exists(SAVE_FILE)
+
+    def save_game():
+        snapshot_worker.submit(None, save_snapshot, SAVE_FILE, snapshots.encode(state))
+
+    def game_in_progress():
+        return state and not (game_over or splash_screen or waiting_to_start)
+
+    # Score saving prompt, typed in over several frames
+    entering_initials = False
+    initials = ""
+
     # Play splash screen music
-    pygame.mixer.music.load(splash_music)
-    pygame.mixer.music.play(-1)
+    audio.play_music(splash_music, -1)
 
     # Load the splash image
-    splash_image = pygame.image.load('media/splash.jpg')
-    splash_image = pygame.transform.scale(splash_image, (SCREEN_WIDTH, SCREEN_HEIGHT))
+    splash_image = assets.image('media/splash.jpg')
+
+    # Decode sounds and the first background while the splash screen is up
+    audio.preload([brick_hit_sound, paddle_hit_sound, bonus_brick_sound])
+    assets.prefetch_background()
+    startup_timings['splash'] = time.perf_counter() - splash_start
+    report_startup(startup_timings)
 
     high_scores = []
 
+    def show_high_scores(scores):
+        nonlocal high_scores
+        high_scores = scores
+
+    def back_to_splash():
+        nonlocal splash_screen, choosing_difficulty, game_over, saved_game
+        splash_screen = True
+        saved_game = os.path.exists(SAVE_FILE)
+        choosing_difficulty = True
+        audio.play_music(splash_music, -1)
+        game_over = False
+
+    brick_layer = BrickLayer()
+    renderer = DirtyRectRenderer(screen, brick_layer)
+
+    def apply_quality():
+        # Put the governor's current tier into effect
+        tier = governor.tier
+        audio.repeat_interval = SOUND_REPEAT_INTERVAL * (MERGED_SOUND_FACTOR if tier >= QUALITY_MERGE_SOUNDS else 1)
+        brick_layer.set_animate_flashing(tier < QUALITY_STATIC_FLASHING)
+        if state:
+            state.ball_limit = MAX_BALLS_UNDER_LOAD if tier >= QUALITY_BALL_CAP else None
+        renderer.invalidate()
+
+    accumulator = 0.0
+
     while running:
+        frame_start = time.perf_counter()
+        profiler.begin_frame()
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                profiler.toggle_overlay()
+                continue
+            if event.type == pygame.KEYDOWN and entering_initials:
+                if event.key == pygame.K_RETURN:
+                    entering_initials = False
+                    score_worker.submit(None, save_score, initials, state.score, state.total_time, state.difficulty)
+                    back_to_splash()
+                elif event.key == pygame.K_BACKSPACE:
+                    initials = initials[:-1]
+                else:
+                    initials += event.unicode
+                continue
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_p:
                     paused = not paused
-                if game_over and event.key == pygame.K_RETURN:
-                    splash_screen = True
-                    choosing_difficulty = True
-                    pygame.mixer.music.load(splash_music)
-                    pygame.mixer.music.play(-1)
-                    game_over = False
-                if splash_screen and choosing_difficulty:
-                    if event.key == pygame.K_1:
-                        difficulty = 1
-                        choosing_difficulty = False
-                        high_scores = load_high_scores(difficulty)
-                        paddle, balls, bricks, score, level, difficulty, power_ups, background_image = new_game(difficulty=difficulty)
-                    elif event.key == pygame.K_2:
-                        difficulty = 2
-                        choosing_difficulty = False
-                        high_scores = load_high_scores(difficulty)
-                        paddle, balls, bricks, score, level, difficulty, power_ups, background_image = new_game(difficulty=difficulty)
-                    elif event.key == pygame.K_3:
-                        difficulty = 3
-                        choosing_difficulty = False
-                        high_scores = load_high_scores(difficulty)
-                        paddle, balls, bricks, score, level, difficulty, power_ups, background_image = new_game(difficulty=difficulty)
+                    if paused and game_in_progress():
+                        save_game()
+                if game_over and event.key == pygame.K_y:
+                    entering_initials = True
+                    initials = ""
+                    continue
+                if game_over and event.key in (pygame.K_n, pygame.K_RETURN):
+                    back_to_splash()
+                    continue
+                if splash_screen and choosing_difficulty and event.key in (pygame.K_1, pygame.K_2, pygame.K_3):
+                    difficulty = {pygame.K_1: 1, pygame.K_2: 2, pygame.K_3: 3}[event.key]
+                    choosing_difficulty = False
+                    high_scores = []
+                    score_worker.submit(show_high_scores, load_high_scores, difficulty)
+                    state = GameState(difficulty, levels=levels)
+                    # Recordings replay on the built-in levels, so games on other levels aren't recorded
+                    session = Session(difficulty, state.seed) if RECORD_DIR and levels is CLASSIC_LEVELS else None
+                    pending_input = 0
+                    # Capping balls changes how a game plays out, so recorded games never go that far
+                    governor.limit(QUALITY_BALL_CAP - 1 if session else len(QUALITY_TIER_NAMES) - 1,
+                                   "recording this game")
+                    apply_quality()
+                    rewind.clear()
+                    checkpoint_time = 0.0
+                    background_image = assets.next_background()
+                if splash_screen and choosing_difficulty and saved_game and event.key == pygame.K_r:
+                    try:
+                        state = restore_snapshot(load_snapshot(SAVE_FILE))
+                    except (OSError, ValueError, struct.error, zlib.error) as error:
+                        print(f"couldn't resume the saved game: {error}")
+                        saved_game = False
+                        continue
+                    # Back into the game where it was saved, paused until P is pressed
+                    difficulty = state.difficulty
+                    splash_screen = choosing_difficulty = False
+                    paused = True
+                    session = None
+                    pending_input = 0
+                    left_pressed = right_pressed = False
+                    governor.limit(len(QUALITY_TIER_NAMES) - 1, "")
+                    apply_quality()
+                    rewind.clear()
+                    checkpoint_time = state.total_time
+                    background_image = assets.next_background()
+                    audio.stop_music()
                 if splash_screen and event.key == pygame.K_RETURN and not choosing_difficulty:
                     splash_screen = False
                     waiting_to_start = True  # Set to wait for user to start game
                 if waiting_to_start and event.key == pygame.K_RETURN:
                     waiting_to_start = False  # Start the game
-                    for ball in balls:
-                        ball.attached = False
+                    launch(state)
+                    pending_input |= INPUT_LAUNCH
 
                     # Reset paddle control states
                     left_pressed = False
                     right_pressed = False
 
                     # Stop splash music
-                    pygame.mixer.music.stop()
-
-                    # Start the timer for the level
-                    level_start_time = time.time()
-
-                if level_complete and event.key == pygame.K_RETURN:
-                    level_complete = False
-                    paddle.reset_size()  # Reset paddle size at the end of the level
-                    ball = Ball(BALL_SPEEDS[difficulty])
-                    ball.reset(paddle)
-                    ball.attached = False  # Ensure the ball moves immediately
-                    balls = [ball]
-                    bricks = create_bricks(BRICK_COLORS[level % len(BRICK_COLORS)])
-                    power_ups = []  # Clear any remaining power-ups
-                    background_image = pygame.image.load(random.choice(bg_images))
-                    background_image = pygame.transform.scale(background_image, (SCREEN_WIDTH, SCREEN_HEIGHT))
-
-                    # Start the timer for the next level
-                    level_start_time = time.time()
+                    audio.stop_music()
+
+                if state and state.level_complete and event.key == pygame.K_RETURN:
+                    start_next_level(state)
+                    pending_input |= INPUT_NEXT_LEVEL
+                    background_image = assets.next_background()
 
                 if event.key == pygame.K_LEFT:
                     left_pressed = True
                 if event.key == pygame.K_RIGHT:
                     right_pressed = True
-                if event.key == pygame.K_SPACE and paddle.shooting_power and paddle.balls_to_shoot > 0:
-                    new_ball = Ball(BALL_SPEEDS[difficulty], paddle.rect.centerx - BALL_RADIUS, paddle.rect.top - BALL_RADIUS * 2)
-                    new_ball.bounce_off_paddle(paddle)
-                    new_ball.attached = False
-                    balls.append(new_ball)
-                    paddle.balls_to_shoot -= 1
-                    if paddle.balls_to_shoot == 0:
-                        paddle.shooting_power = False
+                if event.key == pygame.K_SPACE and state and pending_input >> INPUT_SHOT_SHIFT < MAX_SHOTS_PER_TICK:
+                    pending_input += 1 << INPUT_SHOT_SHIFT  # Fired at the start of the next tick
+                if event.key == pygame.K_BACKSPACE:
+                    rewinding = True
 
             if event.type == pygame.KEYUP:
+                if event.key == pygame.K_BACKSPACE:
+                    rewinding = False
                 if event.key == pygame.K_LEFT:
                     left_pressed = False
-                    paddle.reset_speed()
                 if event.key == pygame.K_RIGHT:
                     right_pressed = False
-                    paddle.reset_speed()
-
-        keys = pygame.key.get_pressed()
-        if not game_over and not paused and not splash_screen and not waiting_to_start and not level_complete:
-            if left_pressed:
-                paddle.accelerate()
-                paddle.move('left')
-            if right_pressed:
-                paddle.accelerate()
-                paddle.move('right')
-
-            for ball in balls:
-                if ball.attached:
-                    ball.rect.x = paddle.rect.centerx - BALL_RADIUS
-                    ball.rect.y = paddle.rect.top - BALL_RADIUS * 2
-                else:
-                    ball.move()
-
-                # Ball collision with walls
-                if ball.rect.left <= 0:
-                    ball.rect.left = 0
-                    ball.bounce('x')
-                if ball.rect.right >= SCREEN_WIDTH:
-                    ball.rect.right = SCREEN_WIDTH - ball.rect.width
-                    ball.bounce('x')
-                if ball.rect.top <= 0:
-                    ball.rect.top = 0
-                    ball.bounce('y')
-
-                # Ball collision with paddle
-                if ball.rect.colliderect(paddle.rect) and not ball.attached:
-                    ball.bounce_off_paddle(paddle)
-                    paddle_hit_sound.play()
-
-                # Ball collision with bricks
-                for brick in bricks[:]:
-                    if ball.rect.colliderect(brick.rect):
-                        ball.bounce('y')
-                        brick_hit_sound.play()
-                        score += 1  # Score 1 point for each brick broken
-                        if brick.hit_brick():
-                            if (brick.power_up):
-                                power_ups.append(brick.power_up)
-                                bonus_brick_sound.play()  # Play bonus sound when power-up brick is hit
-                            bricks.remove(brick)
-
-            # Move power-ups
-            for power_up in power_ups[:]:
-                power_up.move()
-                if power_up.rect.colliderect(paddle.rect):
-                    if power_up.type == 'expand':
-                        paddle.expand()
-                    elif power_up.type == 'extra_ball':
-                        new_ball = Ball(BALL_SPEEDS[difficulty], paddle.rect.centerx - BALL_RADIUS, paddle.rect.top - BALL_RADIUS * 2)
-                        new_ball.bounce_off_paddle(paddle)
-                        new_ball.attached = False
-                        balls.append(new_ball)
-                    elif power_up.type == 'additional_bricks':
-                        new_bricks = create_flashing_bricks(5, bricks)
-                        bricks.extend(new_bricks)
-                    elif power_up.type == 'remove_balls':
-                        if len(balls) > 1:
-                            highest_ball = find_highest_ball(balls)
-                            balls = [highest_ball]
-                        else:
-                            new_bricks = create_additional_bricks(3, bricks, BRICK_COLORS[level % len(BRICK_COLORS)])
-                            bricks.extend(new_bricks)
-                        paddle.reset_size_based_on_difficulty(difficulty)
-                    elif power_up.type == 'shooting':
-                        paddle.enable_shooting()
-                    power_ups.remove(power_up)
-                elif power_up.rect.top >= SCREEN_HEIGHT:
-                    power_ups.remove(power_up)
-
-            # Remove balls that fall below the screen
-            balls = [ball for ball in balls if ball.rect.top < SCREEN_HEIGHT]
-
-            # Check if all balls are lost
-            if not balls:
-                game_over = True
-                pygame.mixer.music.load(game_over_music)
-                pygame.mixer.music.play()
-
-                # Stop the timer and calculate total time
-                total_time += time.time() - level_start_time
-
-            # Check if all bricks are destroyed
-            if not bricks:
-                level_complete = True
-                level += 1
-
-                # Stop the timer and calculate total time
-                total_time += time.time() - level_start_time
-
-        screen.fill(BLACK)
-
-        if splash_screen:
+
+        score_worker.run_callbacks()
+        snapshot_worker.run_callbacks()
+        profiler.mark('events')
+
+        # Holding Backspace runs the game backwards through the rewind buffer instead of stepping it
+        if rewinding and game_in_progress():
+            shown = rewind.latest
+            snapshot = rewind.rewind(REWIND_SPEED)
+            if snapshot:
+                same_board = shown is not None and shown[2] == snapshot[2]
+                state = restore_snapshot(snapshot, state.levels, state.bricks if same_board else None)
+                snapshots.invalidate()
+                session = None  # A recording can't follow the game back in time, so it stops here
+                governor.limit(len(QUALITY_TIER_NAMES) - 1, "")
+                apply_quality()
+                renderer.invalidate()
+            profiler.mark('snapshot')
+
+        # Run as many fixed physics steps as the elapsed time calls for, independent of the render rate
+        while accumulator >= PHYSICS_STEP:
+            in_play = game_in_progress() and not (rewinding or state.level_complete)
+            if in_play and paused and session:
+                session.record(INPUT_PAUSED)
+            elif in_play and not paused:
+                inputs = pending_input | (INPUT_LEFT if left_pressed else 0) | (INPUT_RIGHT if right_pressed else 0)
+                pending_input = 0
+                if session:
+                    session.record(inputs)
+                state.remember_positions()
+                fire_queued_shots(state, inputs)
+                step_game(state, left_pressed, right_pressed, profiler if profiler.enabled else None)
+                audio.queue(state.sounds)
+                profiler.mark('audio')
+                rewind.record(snapshots.encode(state))
+                if state.total_time - checkpoint_time >= CHECKPOINT_INTERVAL:
+                    checkpoint_time = state.total_time
+                    snapshot_worker.submit(None, save_snapshot, SAVE_FILE, rewind.latest)
+                profiler.mark('snapshot')
+                for rect in state.changed_bricks:
+                    renderer.invalidate(rect)
+                if state.game_over:
+                    save_session()
+                    snapshot_worker.submit(None, discard_snapshot, SAVE_FILE)
+                    game_over = True
+                    audio.play_music(game_over_music)
+            accumulator -= PHYSICS_STEP
+        audio.flush()
+        profiler.mark('audio')
+        alpha = accumulator / PHYSICS_STEP if INTERPOLATE_RENDER else 1.0
+        background = background_image if governor.tier < QUALITY_NO_BACKGROUND else None
+
+        # Active play only touches the regions that changed; every other screen is drawn in full
+        dirty_frame = DIRTY_RECT_RENDERING and not (splash_screen or game_over or paused or state.level_complete)
+        dirty_rects = None
+        if dirty_frame:
+            overlay = profiler.draw_overlay if profiler.show_overlay else None
+            dirty_rects = renderer.draw(background, state.paddle, state.balls, state.bricks, state.power_ups,
+                                        state.score, alpha, overlay)
+        elif splash_screen:
             screen.blit(splash_image, (0, 0))  # Draw the splash image
 
             current_time = pygame.time.get_ticks()
@@ -591,11 +2284,9 @@ def main():
                 high_scores_text_timer = current_time
                 high_scores_text_index = (high_scores_text_index + 1) % len(high_scores_text_colors)
 
-            font = pygame.font.Font(None, 74)
             text_color = splash_text_colors[splash_text_index]
-            text = font.render("", True, text_color)
+            text = text_cache.render("", 74, text_color)
             screen.blit(text, (text_x - text.get_width() // 2, text_y - text.get_height() // 2))
-            font = pygame.font.Font(None, 36)
             current_time = pygame.time.get_ticks()
             if current_time - flash_text_timer > flash_text_interval:
                 flash_text_timer = current_time
@@ -603,103 +2294,87 @@ def main():
                 
             flash_text_color = flash_text_colors[flash_text_index]
             if choosing_difficulty:
-                text = font.render("Choose Difficulty: 1 - 3", True, flash_text_color)
+                text = text_cache.render("Choose Difficulty: 1 - 3", 36, flash_text_color)
                 screen.blit(text, (SCREEN_WIDTH // 2 - text.get_width() // 2, SCREEN_HEIGHT - 475))
+                if saved_game:
+                    text = text_cache.render("Press R to Resume Saved Game", 36, flash_text_color)
+                    screen.blit(text, (SCREEN_WIDTH // 2 - text.get_width() // 2, SCREEN_HEIGHT - 435))
             else:
-                text = font.render("Press Enter to Start", True, flash_text_color)
+                text = text_cache.render("Press Enter to Start", 36, flash_text_color)
                 screen.blit(text, (SCREEN_WIDTH // 2 - text.get_width() // 2, SCREEN_HEIGHT - 475))
 
                 # Display top 10 high scores for the selected difficulty
                 high_scores_text = "- High Scores -"
-                high_scores_rendered = font.render(high_scores_text, True, high_scores_text_colors[high_scores_text_index])
+                high_scores_rendered = text_cache.render(high_scores_text, 36, high_scores_text_colors[high_scores_text_index])
                 screen.blit(high_scores_rendered, (SCREEN_WIDTH // 2 - high_scores_rendered.get_width() // 2, SCREEN_HEIGHT - 425))
                 for i, score_entry in enumerate(high_scores):
                     score_text = f"{i + 1}. {score_entry['initials']} - {score_entry['score']} - {score_entry['total_time']}"
-                    score_rendered = font.render(score_text, True, high_scores_text_colors[high_scores_text_index])
+                    score_rendered = text_cache.render(score_text, 36, high_scores_text_colors[high_scores_text_index])
                     screen.blit(score_rendered, (SCREEN_WIDTH // 2 - score_rendered.get_width() // 2, SCREEN_HEIGHT - 400 + i * 25))
         elif not game_over:
-            if not level_complete:
-                screen.blit(background_image, (0, 0))  # Draw the background image
-            paddle.draw(screen, score)
-            for ball in balls:
-                ball.draw(screen)
-            for brick in bricks:
-                brick.draw(screen)
-            for power_up in power_ups:
-                power_up.draw(screen)
+            if background is None or state.level_complete:
+                screen.fill(BLACK)
+            else:
+                screen.blit(background, (0, 0))  # Draw the background image
+            state.paddle.draw(screen, state.score, alpha)
+            draw_balls(screen, state.balls, alpha)
+            brick_layer.draw(screen, state.bricks)
+            draw_power_ups(screen, state.power_ups, alpha)
             if paused:
-                font = pygame.font.Font(None, 74)
-                text = font.render("- PAUSED -", True, BLUE)
+                text = text_cache.render("- PAUSED -", 74, BLUE)
                 screen.blit(text, (SCREEN_WIDTH // 2 - text.get_width() // 2, SCREEN_HEIGHT // 2 - text.get_height() // 2))
-            elif level_complete:
-                font = pygame.font.Font(None, 74)
-                text = font.render(f"Level {level} Complete!", True, WHITE)
+            elif state.level_complete:
+                text = text_cache.render(f"Level {state.level} Complete!", 74, WHITE)
                 screen.blit(text, (SCREEN_WIDTH // 2 - text.get_width() // 2, SCREEN_HEIGHT // 2 - text.get_height() // 2))
-                font = pygame.font.Font(None, 36)
-                text = font.render("Press Enter to Start Next Level", True, WHITE)
+                text = text_cache.render("Press Enter to Start Next Level", 36, WHITE)
                 screen.blit(text, (SCREEN_WIDTH // 2 - text.get_width() // 2, SCREEN_HEIGHT // 2 + text.get_height()))
                 
                 # Display total time
-                total_time_text = font.render(f"Total Time: {format_time(total_time)}", True, WHITE)
+                total_time_text = text_cache.render(f"Total Time: {format_time(state.total_time)}", 36, WHITE)
                 screen.blit(total_time_text, (SCREEN_WIDTH // 2 - total_time_text.get_width() // 2, SCREEN_HEIGHT // 2 + 2 * text.get_height()))
+        elif entering_initials:
+            screen.fill(BLACK)
+            text = text_cache.render("Enter your initials: " + initials, 36, WHITE)
+            screen.blit(text, (SCREEN_WIDTH // 2 - text.get_width() // 2, SCREEN_HEIGHT // 2))
         else:
-            font = pygame.font.Font(None, 74)
-            text = font.render("Game Over", True, RED)
+            screen.fill(BLACK)
+            text = text_cache.render("Game Over", 74, RED)
             screen.blit(text, (SCREEN_WIDTH // 2 - text.get_width() // 2, SCREEN_HEIGHT // 2 - text.get_height() // 2))
-            font = pygame.font.Font(None, 36)
-            score_text = font.render(f"Score: {score}", True, WHITE)
+            score_text = text_cache.render(f"Score: {state.score}", 36, WHITE)
             screen.blit(score_text, (SCREEN_WIDTH // 2 - score_text.get_width() // 2, SCREEN_HEIGHT // 2 + score_text.get_height()))
           
            # Display total time
-            total_time_text = font.render(f"Time: {format_time(total_time)}", True, WHITE)
+            total_time_text = text_cache.render(f"Time: {format_time(state.total_time)}", 36, WHITE)
             screen.blit(total_time_text, (SCREEN_WIDTH // 2 - total_time_text.get_width() // 2, SCREEN_HEIGHT // 2 + 3 * text.get_height()))
             
             # Ask the user if they want to save their score
-            font = pygame.font.Font(None, 36)
-            text = font.render("Save score? (Y/N)", True, WHITE)
+            text = text_cache.render("Save score? (Y/N)", 36, WHITE)
             screen.blit(text, (SCREEN_WIDTH // 2 - text.get_width() // 2, SCREEN_HEIGHT // 2 + 4 * text.get_height()))
 
+        if not dirty_frame:
+            renderer.invalidate()  # The next frame of active play starts from a full redraw
+            if profiler.show_overlay:
+                profiler.draw_overlay(screen)
+        profiler.mark('render')
+        if dirty_rects is None:
             pygame.display.flip()
-            
-            while True:
-                event = pygame.event.wait()
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_y:
-                        initials = ""
-                        save_dialog = True
-                        while save_dialog:
-                            for e in pygame.event.get():
-                                if e.type == pygame.KEYDOWN:
-                                    if e.key == pygame.K_RETURN:
-                                        save_dialog = False
-                                    elif e.key == pygame.K_BACKSPACE:
-                                        initials = initials[:-1]
-                                    else:
-                                        initials += e.unicode
-                            screen.fill(BLACK)
-                            text = font.render("Enter your initials: " + initials, True, WHITE)
-                            screen.blit(text, (SCREEN_WIDTH // 2 - text.get_width() // 2, SCREEN_HEIGHT // 2))
-                            pygame.display.flip()
-                        save_score(initials, score, total_time, difficulty)
-                        splash_screen = True
-                        choosing_difficulty = True
-                        pygame.mixer.music.load(splash_music)
-                        pygame.mixer.music.play(-1)
-                        game_over = False
-                        break
-                    elif event.key == pygame.K_n:
-                        splash_screen = True
-                        choosing_difficulty = True
-                        pygame.mixer.music.load(splash_music)
-                        pygame.mixer.music.play(-1)
-                        game_over = False
-                        break
-            text = font.render("Press Enter", True, WHITE)
-            screen.blit(text, (SCREEN_WIDTH // 2 - text.get_width() // 2, SCREEN_HEIGHT // 2 + 5 * text.get_height()))
-
-        pygame.display.flip()
-        clock.tick(60)
-
+        else:
+            pygame.display.update(dirty_rects)
+        profiler.mark('flip')
+        profiler.end_frame(state, governor.tier)
+
+        # Only time spent working counts against the budget, not the wait for the next frame
+        if governor.update(time.perf_counter() - frame_start):
+            apply_quality()
+
+        frame_time = clock.tick(RENDER_FPS) / 1000.0
+        accumulator = min(accumulator + frame_time, MAX_FRAME_TIME)
+
+    save_session()
+    if game_in_progress():
+        save_game()
+    snapshot_worker.close()
+    profiler.dump()
     pygame.quit()
 
 if __name__ == "__main__":
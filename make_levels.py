@@ -0,0 +1,33 @@
+"""Generate a pack of procedural levels, one JSON level per line, for BRICKS_LEVELS or simulate.py --levels.
+
+Example:
+    python make_levels.py levels.jsonl --count 20 --seed 7 --rows 40 --columns 50
+"""
+import argparse
+import os
+import random
+
+# No window and no audio device needed
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+from bricks import PROCEDURAL_COLUMNS, PROCEDURAL_ROWS, generate_level, write_level_pack
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a pack of generated levels.")
+    parser.add_argument('output', help="level pack file to write")
+    parser.add_argument('--count', type=int, default=10, help="number of levels")
+    parser.add_argument('--seed', type=int, default=0, help="level i is generated from seed and i")
+    parser.add_argument('--rows', type=int, default=PROCEDURAL_ROWS)
+    parser.add_argument('--columns', type=int, default=PROCEDURAL_COLUMNS)
+    args = parser.parse_args()
+
+    levels = [generate_level(random.Random(f"{args.seed}:{i}"), args.rows, args.columns, f"{args.seed}:{i}")
+              for i in range(args.count)]
+    write_level_pack(args.output, levels)
+    print(f"wrote {len(levels)} levels, {sum(len(level.bricks) for level in levels)} bricks, to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
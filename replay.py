@@ -0,0 +1,52 @@
+"""Replay a recorded Brick Breaker session headless, faster than real time.
+
+Record sessions by running the game with BRICKS_RECORD_DIR set to a directory, then:
+    python replay.py sessions/session-20240101-120000-1234.brs --slowest 20
+"""
+import argparse
+import os
+import time
+
+# No window and no audio device for headless runs
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+from bricks import PHYSICS_STEP, Session, replay_session
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded session without a window.")
+    parser.add_argument('session', help="session file written by the game")
+    parser.add_argument('--slowest', type=int, default=0, metavar='N', help="time every step and list the N slowest")
+    args = parser.parse_args()
+
+    session = Session.load(args.session)
+    step_times = []
+    on_step = None
+    if args.slowest:
+        last = [time.perf_counter()]
+
+        def on_step(tick, state):
+            now = time.perf_counter()
+            step_times.append((now - last[0], tick, len(state.balls), len(state.bricks), len(state.power_ups)))
+            last[0] = now
+
+    start = time.perf_counter()
+    state = replay_session(session, on_step)
+    elapsed = time.perf_counter() - start
+
+    print(f"replayed {len(session.ticks)} ticks ({state.steps} steps) in {elapsed:.3f}s, "
+          f"{state.steps * PHYSICS_STEP / max(elapsed, 1e-9):.0f}x real time")
+    print(f"score {state.score}, level {state.level}, game over {state.game_over}")
+    matches = (state.score, state.level, state.steps) == (session.score, session.level, session.steps)
+    print("matches the recording" if matches else
+          f"DIVERGED from the recording: score {session.score}, level {session.level}, steps {session.steps}")
+
+    for seconds, tick, balls, bricks, power_ups in sorted(step_times, reverse=True)[:args.slowest]:
+        print(f"tick {tick:>7}: {seconds * 1000:.3f} ms  balls {balls}  bricks {bricks}  power-ups {power_ups}")
+    if not matches:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
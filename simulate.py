@@ -0,0 +1,102 @@
+"""Run seeded Brick Breaker games headless, as fast as the CPU allows.
+
+Example:
+    python simulate.py --games 1000 --difficulty 2 --policy track --output results.jsonl
+"""
+import argparse
+import json
+import os
+import time
+
+# No window and no audio device for headless runs
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+from bricks import BALL_RADIUS, PADDLE_SPEED, GameState, launch, open_levels, shoot, start_next_level, step_game
+
+MAX_STEPS = 60 * 60 * 10  # Ten minutes of play at 60 steps per second
+MAX_LEVEL = 10
+
+
+# Paddle policies take the game state and return (left, right, shoot) for the next step
+def track_policy(state):
+    # Follow the lowest ball that is falling, or the lowest ball if none are. The contact point on the
+    # paddle drifts over time so returns leave at varied angles instead of locking into a vertical loop.
+    balls = state.balls
+    falling = [ball for ball in balls if ball.dy > 0] or balls
+    target = max(falling, key=lambda ball: ball.rect.bottom).rect.x + BALL_RADIUS
+    aim = ((state.steps // 300) % 5 - 2) * state.paddle.rect.width // 6
+    offset = target - aim - state.paddle.rect.centerx
+    dead_zone = PADDLE_SPEED // 2
+    return offset < -dead_zone, offset > dead_zone, state.paddle.shooting_power
+
+
+def sweep_policy(state):
+    # Scripted back-and-forth sweep across the screen, ignoring the balls
+    left = (state.steps // 90) % 2 == 0
+    return left, not left, False
+
+
+POLICIES = {
+    'track': track_policy,
+    'sweep': sweep_policy,
+}
+
+
+def run_game(seed, difficulty=2, policy=track_policy, max_steps=MAX_STEPS, max_level=MAX_LEVEL, levels=None):
+    state = GameState(difficulty, seed=seed, levels=levels)
+    launch(state)
+    while not state.game_over and state.steps < max_steps:
+        if state.level_complete:
+            if state.level >= max_level:
+                break
+            start_next_level(state)
+        left, right, fire = policy(state)
+        if fire:
+            shoot(state)
+        step_game(state, left, right)
+    return {
+        'seed': seed,
+        'difficulty': difficulty,
+        'score': state.score,
+        'level': state.level,
+        'total_time': round(state.total_time, 3),
+        'steps': state.steps,
+        'balls_lost': state.balls_lost,
+        'power_ups_collected': state.power_ups_collected,
+        'game_over': state.game_over,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run seeded Brick Breaker games without a window.")
+    parser.add_argument('--games', type=int, default=100, help="number of games to run")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first game; game i uses seed + i")
+    parser.add_argument('--difficulty', type=int, choices=[1, 2, 3], default=2)
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='track', help="paddle policy")
+    parser.add_argument('--max-steps', type=int, default=MAX_STEPS, help="physics steps before a game is cut off")
+    parser.add_argument('--max-level', type=int, default=MAX_LEVEL, help="stop a game once it reaches this level")
+    parser.add_argument('--levels', help="level pack file, or procedural[:seed]; the built-in wall by default")
+    parser.add_argument('--output', help="write one JSON line of stats per game to this file")
+    args = parser.parse_args()
+
+    levels = open_levels(args.levels)
+    start = time.perf_counter()
+    results = []
+    for i in range(args.games):
+        results.append(run_game(args.seed + i, args.difficulty, POLICIES[args.policy], args.max_steps, args.max_level, levels))
+    elapsed = time.perf_counter() - start
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            for result in results:
+                file.write(json.dumps(result) + '\n')
+
+    steps = sum(result['steps'] for result in results)
+    print(f"{len(results)} games, {steps} steps in {elapsed:.2f}s ({steps / max(elapsed, 1e-9):.0f} steps/s)")
+    print(f"mean score {sum(result['score'] for result in results) / len(results):.1f}, "
+          f"mean level {sum(result['level'] for result in results) / len(results):.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import random
+
+import numpy as np
+
+import bricks
+from brickfield import BrickField, NO_POWER_UP, roll_power_ups
+
+BALL_SIZE = bricks.BALL_RADIUS * 2
+
+
+def make_bricks():
+    return [bricks.Brick(10, 10, bricks.BRICK_COLORS[0], False),
+            bricks.Brick(100, 10, bricks.BRICK_COLORS[1], True),
+            bricks.Brick(200, 10, bricks.BRICK_COLORS[2], True),
+            bricks.Brick(300, 10, bricks.BRICK_COLORS[3], False)]
+
+
+def test_collide_matches_hit_brick():
+    expected = make_bricks()
+    field = BrickField.from_bricks(make_bricks())
+    size = BALL_SIZE
+    # Two balls on the two-hit brick at x=200 in the same pass, one each on x=10 and x=100, none on x=300
+    ball_x = [12, 105, 205, 210]
+    ball_y = [12, 12, 12, 14]
+    hits = field.collide(ball_x, ball_y, size, rng=np.random.default_rng(0))
+
+    destroyed = []
+    for x, y in zip(ball_x, ball_y):
+        ball = bricks.pygame.Rect(x, y, size, size)
+        for index, brick in enumerate(expected):
+            if brick not in [expected[i] for i in destroyed] and ball.colliderect(brick.rect) and brick.hit_brick():
+                destroyed.append(index)
+
+    assert sorted(hits.brick_index.tolist()) == [0, 1, 2, 2]
+    assert hits.destroyed.tolist() == sorted(destroyed) == [0, 2]
+    assert field.alive.tolist() == [index not in destroyed for index in range(len(expected))]
+    assert field.hit.tolist() == [brick.hit for brick in expected]
+    assert [tuple(color) for color in field.color.tolist()] == [brick.color for brick in expected]
+    assert set(hits.power_ups.tolist()) <= set(hits.destroyed.tolist())
+    assert len(field) == 2
+
+
+def test_cracked_brick_breaks_on_the_next_pass():
+    field = BrickField.from_bricks(make_bricks())
+    assert not len(field.collide([105], [12], BALL_SIZE).destroyed)
+    assert field.collide([105], [12], BALL_SIZE).destroyed.tolist() == [1]
+    assert not len(field.collide([105], [12], BALL_SIZE).brick_index)  # Gone bricks aren't hit again
+
+
+def test_from_level_matches_build():
+    level = bricks.generate_level(random.Random(4), rows=20, columns=24)
+    field = BrickField.from_level(level)
+    built = sorted(level.build(), key=lambda brick: (brick.rect.y, brick.rect.x))
+    order = np.lexsort((field.x, field.y))
+    assert len(field) == len(built)
+    assert field.x[order].tolist() == [brick.rect.x for brick in built]
+    assert field.y[order].tolist() == [brick.rect.y for brick in built]
+    assert field.requires_two_hits[order].tolist() == [brick.requires_two_hits for brick in built]
+    assert (field.width, field.height) == level.brick_size
+
+
+def test_roll_power_ups_uses_the_registered_rates():
+    rolls = roll_power_ups(200000, np.random.default_rng(1))
+    for index, name in enumerate(bricks.power_up_registry.names):
+        assert abs((rolls == index).mean() - bricks.power_up_registry.kinds[name].chance) < 0.005
+    assert abs((rolls == NO_POWER_UP).mean() - (1 - bricks.power_up_registry.thresholds[-1])) < 0.005
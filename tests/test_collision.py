@@ -0,0 +1,78 @@
+import math
+
+import pytest
+
+import bricks
+
+RADIUS = bricks.BALL_RADIUS
+
+
+def make_ball(center_x, center_y, dx, dy):
+    ball = bricks.Ball(5, center_x - RADIUS, center_y - RADIUS)
+    ball.dx, ball.dy = dx, dy
+    ball.attached = False
+    return ball
+
+
+def make_brick(x, y, width, height):
+    return bricks.Brick(x, y, bricks.BRICK_COLORS[0], False, width=width, height=height)
+
+
+@pytest.mark.parametrize('cx, cy, dx, dy, normal', [
+    (80, 110, 20, 0, (-1, 0)),   # Left face
+    (170, 110, -20, 0, (1, 0)),  # Right face
+    (125, 80, 0, 20, (0, -1)),   # Top face
+    (125, 140, 0, -20, (0, 1)),  # Bottom face
+], ids=['left', 'right', 'top', 'bottom'])
+def test_face_hit(cx, cy, dx, dy, normal):
+    t, normal_x, normal_y = bricks.sweep_circle_rect(cx, cy, RADIUS, dx, dy, bricks.pygame.Rect(100, 100, 50, 20))
+    assert t == pytest.approx(0.5)
+    assert (normal_x, normal_y) == normal
+
+
+def test_corner_hit_has_diagonal_normal():
+    rect = bricks.pygame.Rect(100, 100, 50, 20)
+    expected_t = (20 - RADIUS / math.sqrt(2)) / 20
+    for impact in (bricks.sweep_circle_rect(80, 80, RADIUS, 20, 20, rect),
+                   bricks.sweep_circle_corner(80, 80, RADIUS, 20, 20, rect.left, rect.top)):
+        t, normal_x, normal_y = impact
+        assert t == pytest.approx(expected_t)
+        assert (normal_x, normal_y) == pytest.approx((-1 / math.sqrt(2), -1 / math.sqrt(2)))
+
+
+def test_corner_miss():
+    # The grown box is entered, but the path passes outside the rounded corner
+    assert bricks.sweep_circle_rect(80, 88, RADIUS, 20, -20, bricks.pygame.Rect(100, 100, 50, 20)) is None
+
+
+def test_fast_ball_does_not_tunnel_through_thin_brick():
+    impact = bricks.sweep_circle_rect(125, 80, RADIUS, 0, 30, bricks.pygame.Rect(100, 100, 50, 5))
+    assert impact is not None and impact[1:] == (0, -1)
+
+    brick = make_brick(100, 100, 50, 5)
+    ball = make_ball(125, 80, 0, 30)
+    assert ball.move(bricks.BrickGrid([brick])) == [brick]
+    assert ball.dy == -30
+    assert ball.rect.bottom <= brick.rect.top
+
+
+@pytest.mark.parametrize('cx, cy', [(125, 105), (125, 95)], ids=['inside', 'touching'])
+def test_overlapping_ball_moving_away_is_ignored(cx, cy):
+    assert bricks.sweep_circle_rect(cx, cy, RADIUS, 0, -5, bricks.pygame.Rect(100, 100, 50, 20)) is None
+
+
+def test_two_bricks_in_one_step_bounce_in_time_order():
+    # Ball heads right into first, bounces back and reaches second before the step ends
+    first = make_brick(125, 90, 20, 20)
+    second = make_brick(65, 90, 20, 20)
+    ball = make_ball(100, 100, 40, 0)
+    assert ball.move(bricks.BrickGrid([second, first])) == [first, second]
+    assert (ball.dx, ball.dy) == (40, 0)
+    assert ball.rect.centerx == 100
+
+
+def test_each_brick_bounces_once_per_step():
+    brick = make_brick(100, 100, 50, 20)
+    ball = make_ball(125, 80, 0, 30)
+    assert ball.move(bricks.BrickGrid([brick])) == [brick]
+    assert ball.dy == -30
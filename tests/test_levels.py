@@ -0,0 +1,31 @@
+import random
+
+import pytest
+
+import bricks
+
+
+def test_level_source_is_abstract():
+    with pytest.raises(TypeError):
+        bricks.LevelSource()
+
+
+@pytest.mark.parametrize('source', [bricks.CLASSIC_LEVELS, bricks.ProceduralLevels(3)], ids=['classic', 'procedural'])
+def test_every_source_prepares_levels(source):
+    for number in range(3):
+        level, grid = source.prepare(number)
+        assert len(grid) == len(level.bricks) > 0
+
+
+def test_level_pack_prepares_levels(tmp_path):
+    path = str(tmp_path / 'pack.jsonl')
+    bricks.write_level_pack(path, [bricks.ProceduralLevels(5).load(number) for number in range(2)])
+    pack = bricks.open_levels(path)
+    first, _ = pack.prepare(0)
+    assert pack.prepare(2)[0].to_json() == first.to_json()  # Play loops back to the first level
+
+
+def test_classic_get_uses_the_game_rng():
+    first, _ = bricks.CLASSIC_LEVELS.get(1, random.Random(7))
+    second, _ = bricks.CLASSIC_LEVELS.get(1, random.Random(7))
+    assert first.to_json() == second.to_json()
@@ -0,0 +1,47 @@
+import json
+
+import bricks
+
+
+def make_store(tmp_path):
+    return bricks.ScoreStore(str(tmp_path / 'scores.jsonl'), str(tmp_path / 'scores_top.json'),
+                             str(tmp_path / 'scores.json'))
+
+
+def entry(initials, score, difficulty=2):
+    return {"initials": initials, "score": score, "total_time": "1 min 0 sec", "difficulty": difficulty}
+
+
+def test_migrates_legacy_scores(tmp_path):
+    legacy = [entry("AAA", 83), entry("BBB", 130, 3), entry("CCC", 87), entry("DDD", 87)]
+    (tmp_path / 'scores.json').write_text(json.dumps(legacy, indent=4))
+
+    store = make_store(tmp_path)
+    assert store.high_scores(2) == [entry("CCC", 87), entry("DDD", 87), entry("AAA", 83)]
+    assert store.high_scores(3) == [entry("BBB", 130, 3)]
+    lines = (tmp_path / 'scores.jsonl').read_text().splitlines()
+    assert [json.loads(line) for line in lines] == legacy
+
+    # Migration happens once; a fresh store reads the log and index instead of the legacy file
+    (tmp_path / 'scores.json').write_text('[]')
+    assert make_store(tmp_path).high_scores(2) == [entry("CCC", 87), entry("DDD", 87), entry("AAA", 83)]
+
+
+def test_migrated_malformed_entries_are_skipped(tmp_path):
+    legacy = [entry("AAA", 83), {"initials": "BBB", "difficulty": 2}, ["CCC", 90, 2], "DDD",
+              {"initials": "EEE", "score": "lots", "total_time": "", "difficulty": 2},
+              {"initials": "FFF", "score": 95, "total_time": "", "difficulty": [2]}, entry("GGG", 100)]
+    (tmp_path / 'scores.json').write_text(json.dumps(legacy))
+
+    store = make_store(tmp_path)
+    assert store.high_scores(2) == [entry("GGG", 100), entry("AAA", 83)]
+    store.add(entry("HHH", 90))
+    assert make_store(tmp_path).high_scores(2) == [entry("GGG", 100), entry("HHH", 90), entry("AAA", 83)]
+
+
+def test_malformed_index_is_rebuilt(tmp_path):
+    store = make_store(tmp_path)
+    store.add(entry("AAA", 50))
+    store.add(entry("BBB", 60))
+    (tmp_path / 'scores_top.json').write_text(json.dumps({"top": []}))
+    assert make_store(tmp_path).high_scores(2) == [entry("BBB", 60), entry("AAA", 50)]
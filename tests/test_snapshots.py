@@ -0,0 +1,55 @@
+import bricks
+
+
+def play(seed=3, steps=5):
+    # A game a few steps after launch, with every step encoded into a rewind buffer
+    state = bricks.GameState(2, seed=seed)
+    bricks.launch(state)
+    encoder = bricks.SnapshotEncoder()
+    buffer = bricks.RewindBuffer()
+    buffer.record(encoder.encode(state))
+    for _ in range(steps):
+        bricks.step_game(state)
+        buffer.record(encoder.encode(state))
+    return state, encoder, buffer
+
+
+def test_restore_round_trip():
+    state, encoder, _ = play()
+    snapshot = encoder.encode(state)
+    restored = bricks.restore_snapshot(snapshot)
+    assert bricks.SnapshotEncoder().encode(restored) == snapshot
+    for _ in range(30):
+        bricks.step_game(state)
+        bricks.step_game(restored)
+    assert bricks.SnapshotEncoder().encode(restored) == bricks.SnapshotEncoder().encode(state)
+
+
+def test_encode_after_rewind_and_one_step():
+    # Rewinding one tick onto the same board, then stepping, lands on the step count the encoder's
+    # cache was last brought up to date at; the bricks the new step broke must still be encoded
+    state, encoder, buffer = play()
+    shown = buffer.latest
+    snapshot = buffer.rewind(1)
+    assert snapshot[2] == shown[2]
+    state = bricks.restore_snapshot(snapshot, state.levels, state.bricks)
+    encoder.invalidate()
+
+    # Play differently from the first time: send the ball up into a brick
+    brick = next(iter(state.bricks))
+    ball = state.balls[0]
+    ball.rect.topleft = (brick.rect.x, brick.rect.bottom + 1)
+    ball.dx, ball.dy = 0, -abs(ball.dy)
+    bricks.step_game(state)
+    assert state.changed_bricks
+
+    assert encoder.encode(state) == bricks.SnapshotEncoder().encode(state)
+
+
+def test_expanded_paddle_still_encodes():
+    state, encoder, _ = play()
+    for _ in range(100):
+        bricks.expand_paddle(state)
+    assert state.paddle.rect.width == bricks.PADDLE_MAX_WIDTH
+    restored = bricks.restore_snapshot(encoder.encode(state))
+    assert restored.paddle.rect.width == bricks.PADDLE_MAX_WIDTH
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+import bricks
+import vecenv
+
+STEPS = 2000
+
+
+@pytest.fixture
+def no_power_ups():
+    # Power-up rolls draw from different RNGs in the two games, so turn drops off for a step-for-step comparison
+    chances = {name: kind.chance for name, kind in bricks.power_up_registry.kinds.items()}
+    for name in chances:
+        bricks.power_up_registry.set_chance(name, 0.0)
+    yield
+    for name, chance in chances.items():
+        bricks.power_up_registry.set_chance(name, chance)
+
+
+def copy_env_to_state(env, state):
+    # The wall's two-hit bricks, the launched ball and the paddle of env's only game
+    for brick, requires_two_hits in zip(state.bricks, env.requires_two_hits[0, :vecenv.WALL_SLOTS]):
+        brick.requires_two_hits = bool(requires_two_hits)
+    ball = state.balls[0]
+    ball.rect.topleft = (int(env.ball_x[0, 0]), int(env.ball_y[0, 0]))
+    ball.dx, ball.dy = env.ball_dx[0, 0], env.ball_dy[0, 0]
+    ball.remember_position()
+    state.paddle.rect.x = int(env.paddle_x[0])
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_env_matches_step_game(seed, no_power_ups):
+    env = vecenv.VecEnv(1, seed=seed)
+    env.reset()
+    state = bricks.GameState(2, seed=seed)
+    bricks.launch(state)
+    assert len(state.bricks) == vecenv.WALL_SLOTS
+    copy_env_to_state(env, state)
+
+    for step in range(STEPS):
+        action = int(vecenv.track_actions(env)[0])
+        bricks.step_game(state, bool(action & vecenv.ACTION_LEFT), bool(action & vecenv.ACTION_RIGHT))
+        _, _, dones = env.step([action])
+        if dones[0]:
+            assert state.game_over or state.level_complete
+            assert env.final_score[0] == state.score
+            break
+        assert int(env.score[0]) == state.score, step
+        assert int(env.paddle_x[0]) == state.paddle.rect.x, step
+        balls = [(ball.rect.x, ball.rect.y) for ball in state.balls]
+        assert [(int(x), int(y)) for x, y in zip(env.ball_x[0, :env.ball_count[0]], env.ball_y[0, :env.ball_count[0]])] == balls, step
@@ -0,0 +1,537 @@
+"""Many independent Brick Breaker games stepped together with NumPy, for training paddle agents.
+
+Every game is held in structure-of-arrays form (one row per game) and all of them advance one
+physics step per call, with the rules of step_game on the built-in wall:
+
+    env = VecEnv(4096, seed=0)
+    observations = env.reset()
+    observations, rewards, dones = env.step(actions)   # actions: ACTION_* bits, one int per game
+
+Games that end are started again straight away; the observation returned for them is of the new game
+and their final score is kept in env.final_score. Run this file to measure env-steps per second.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from bricks import (BALL_RADIUS, BALL_SPEEDS, BRICK_COLUMNS, BRICK_HEIGHT, BRICK_PADDING, BRICK_ROWS, BRICK_WIDTH,
+                    GRID_CELL_HEIGHT, GRID_CELL_WIDTH, INPUT_LEFT, INPUT_RIGHT, MAX_BOUNCES_PER_STEP, PADDLE_ACCELERATION,
+                    PADDLE_BASE_WIDTH, PADDLE_HEIGHT, PADDLE_MAX_SPEED, PADDLE_MAX_WIDTH, PADDLE_SPEED, POWER_UP_SIZE,
+                    POWER_UP_SPEED, SCREEN_HEIGHT, SCREEN_WIDTH, SPAWN_AREA_TOP, SPAWN_COLUMNS, SPAWN_ROWS, power_up_registry)
+from brickfield import NO_POWER_UP, roll_power_ups
+
+# Actions are bit sets, one per game: the paddle keys held for the step, and Space
+ACTION_LEFT = INPUT_LEFT
+ACTION_RIGHT = INPUT_RIGHT
+ACTION_FIRE = 4  # Fire a ball if the shooting power-up has shots left
+
+BALL_SLOTS = 16  # Most balls one game can have in play; extra balls and shots past it are not added
+POWER_UP_SLOTS = 16  # Most power-ups one game can have falling; drops past it are lost
+MAX_STEPS = 60 * 60 * 10  # A game still going after ten minutes of play ends here
+PADDLE_Y = SCREEN_HEIGHT - PADDLE_HEIGHT - 10
+BALL_SIZE = BALL_RADIUS * 2
+
+# Brick slots: the built-in wall, then the spawn lattice power-ups put extra bricks on.
+# (x offset, y offset, columns, rows, first slot) of each lattice.
+LATTICES = [(BRICK_PADDING, BRICK_PADDING, BRICK_COLUMNS, BRICK_ROWS, 0),
+            (0, SPAWN_AREA_TOP, SPAWN_COLUMNS, SPAWN_ROWS, BRICK_COLUMNS * BRICK_ROWS)]
+WALL_SLOTS = BRICK_COLUMNS * BRICK_ROWS
+BRICK_SLOTS = WALL_SLOTS + SPAWN_COLUMNS * SPAWN_ROWS
+BRICK_X = np.concatenate([x + np.tile(np.arange(columns), rows) * GRID_CELL_WIDTH for x, y, columns, rows, first in LATTICES])
+BRICK_Y = np.concatenate([y + np.repeat(np.arange(rows), columns) * GRID_CELL_HEIGHT for x, y, columns, rows, first in LATTICES])
+BRICKS_BOTTOM = int(BRICK_Y.max()) + BRICK_HEIGHT  # No brick slot reaches below this
+
+POWER_UP_KINDS = list(power_up_registry.names)  # Power-up kinds are stored as indexes into this, as roll_power_ups returns them
+
+# Observation row of one game, as float32: paddle x, paddle width and shots left, then x, y, dx, dy of
+# each ball slot, the state of each brick slot (0 gone, 1 whole, 0.5 cracked), and x, y and kind + 1
+# of each power-up slot. Empty slots are zeros.
+OBSERVATION_SIZE = 3 + BALL_SLOTS * 4 + BRICK_SLOTS + POWER_UP_SLOTS * 3
+
+
+def sweep_circles_rects(cx, cy, dx, dy, left, top, right, bottom, radius=BALL_RADIUS):
+    # bricks.sweep_circle_rect over whole arrays, which broadcast together.
+    # Returns (t, normal_x, normal_y) with t = inf where the circle doesn't strike the rect.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        moving_x, moving_y = dx != 0, dy != 0
+        low_x, high_x, low_y, high_y = left - radius, right + radius, top - radius, bottom + radius
+        t1, t2 = (low_x - cx) / dx, (high_x - cx) / dx
+        enter_x = np.where(moving_x, np.minimum(t1, t2), -np.inf)
+        exit_x = np.where(moving_x, np.maximum(t1, t2), np.inf)
+        t1, t2 = (low_y - cy) / dy, (high_y - cy) / dy
+        enter_y = np.where(moving_y, np.minimum(t1, t2), -np.inf)
+        exit_y = np.where(moving_y, np.maximum(t1, t2), np.inf)
+        axis_y = moving_y & (enter_y > enter_x)
+        t_enter = np.maximum(enter_x, enter_y)
+        t_exit = np.minimum(exit_x, exit_y)
+        struck = ((moving_x | ((cx > low_x) & (cx < high_x))) & (moving_y | ((cy > low_y) & (cy < high_y))) &
+                  (t_enter < t_exit) & (t_exit > 0) & (t_enter <= 1))
+        overlapping = t_enter < 0
+
+        # Already overlapping: push out along the offset from the nearest point, or the shallowest axis
+        near_x = np.minimum(np.maximum(cx, left), right)
+        near_y = np.minimum(np.maximum(cy, top), bottom)
+        offset_x, offset_y = cx - near_x, cy - near_y
+        distance = offset_x * offset_x + offset_y * offset_y
+        outside = (offset_x != 0) | (offset_y != 0)
+        length = np.sqrt(distance)
+        side_x = np.minimum(cx - left, right - cx) < np.minimum(cy - top, bottom - cy)
+        push_x = np.where(outside, offset_x / length, np.where(side_x, np.where(cx - left < right - cx, -1.0, 1.0), 0.0))
+        push_y = np.where(outside, offset_y / length, np.where(side_x, 0.0, np.where(cy - top < bottom - cy, -1.0, 1.0)))
+        inward = dx * push_x + dy * push_y < 0
+
+        # Entering: a face, or a rounded corner when the entry point is beyond both faces
+        hit_x, hit_y = cx + dx * t_enter, cy + dy * t_enter
+        beyond_x = (hit_x < left) | (hit_x > right)
+        beyond_y = (hit_y < top) | (hit_y > bottom)
+        face_x = np.where(axis_y, 0.0, np.where(dx > 0, -1.0, 1.0))
+        face_y = np.where(axis_y, np.where(dy > 0, -1.0, 1.0), 0.0)
+
+        corner = np.where(overlapping, (offset_x != 0) & (offset_y != 0) & (distance >= radius * radius), beyond_x & beyond_y)
+        corner_x = np.where(overlapping, near_x, np.where(hit_x < left, left, right))
+        corner_y = np.where(overlapping, near_y, np.where(hit_y < top, top, bottom))
+        t_corner, corner_normal_x, corner_normal_y = sweep_circles_corners(cx, cy, dx, dy, corner_x, corner_y, radius)
+
+        t = np.where(corner, t_corner, np.where(overlapping, np.where(inward, 0.0, np.inf), t_enter))
+        t = np.where(struck, t, np.inf)
+        normal_x = np.where(corner, corner_normal_x, np.where(overlapping, push_x, face_x))
+        normal_y = np.where(corner, corner_normal_y, np.where(overlapping, push_y, face_y))
+    return t, normal_x, normal_y
+
+
+def sweep_circles_corners(cx, cy, dx, dy, corner_x, corner_y, radius=BALL_RADIUS):
+    # bricks.sweep_circle_corner over whole arrays; t = inf where the circle misses the corner
+    offset_x, offset_y = cx - corner_x, cy - corner_y
+    a = dx * dx + dy * dy
+    b = 2 * (offset_x * dx + offset_y * dy)
+    c = offset_x * offset_x + offset_y * offset_y - radius * radius
+    discriminant = b * b - 4 * a * c
+    t = (-b - np.sqrt(np.maximum(discriminant, 0))) / (2 * a)
+    struck = (a != 0) & (discriminant >= 0) & (b < 0) & (t >= 0) & (t <= 1)
+    return np.where(struck, t, np.inf), (offset_x + dx * t) / radius, (offset_y + dy * t) / radius
+
+
+# N games of Brick Breaker on the built-in wall, stepped in lockstep
+class VecEnv:
+    def __init__(self, count, difficulty=2, seed=None, max_steps=MAX_STEPS):
+        self.count = count
+        self.difficulty = difficulty
+        self.speed = BALL_SPEEDS[difficulty]
+        self.paddle_base_width = PADDLE_BASE_WIDTH - (difficulty - 2) * 20
+        self.max_steps = max_steps
+        self.rng = np.random.default_rng(seed)
+        self.rows = np.arange(count)
+
+        # Paddles
+        self.paddle_x = np.zeros(count, dtype=np.int64)
+        self.paddle_width = np.zeros(count, dtype=np.int64)
+        self.paddle_speed = np.zeros(count, dtype=np.int64)
+        self.left_pressed = np.zeros(count, dtype=bool)
+        self.right_pressed = np.zeros(count, dtype=bool)
+        self.shooting = np.zeros(count, dtype=bool)
+        self.shots = np.zeros(count, dtype=np.int64)
+
+        # Balls in play are the first ball_count slots of each row, in the order step_game moves them.
+        # Positions are whole pixels, like the Rect a Ball keeps them in.
+        self.ball_count = np.zeros(count, dtype=np.int64)
+        self.ball_x = np.zeros((count, BALL_SLOTS))
+        self.ball_y = np.zeros((count, BALL_SLOTS))
+        self.ball_dx = np.zeros((count, BALL_SLOTS))
+        self.ball_dy = np.zeros((count, BALL_SLOTS))
+
+        # Bricks, by slot
+        self.alive = np.zeros((count, BRICK_SLOTS), dtype=bool)
+        self.requires_two_hits = np.zeros((count, BRICK_SLOTS), dtype=bool)
+        self.cracked = np.zeros((count, BRICK_SLOTS), dtype=bool)
+        self.bricks_left = np.zeros(count, dtype=np.int64)
+
+        # Falling power-ups, also kept in order in the first power_up_count slots
+        self.power_up_count = np.zeros(count, dtype=np.int64)
+        self.power_up_x = np.zeros((count, POWER_UP_SLOTS), dtype=np.int64)
+        self.power_up_y = np.zeros((count, POWER_UP_SLOTS), dtype=np.int64)
+        self.power_up_kind = np.zeros((count, POWER_UP_SLOTS), dtype=np.int64)
+
+        self.score = np.zeros(count, dtype=np.int64)
+        self.level = np.zeros(count, dtype=np.int64)
+        self.steps = np.zeros(count, dtype=np.int64)
+        self.balls_lost = np.zeros(count, dtype=np.int64)
+        self.power_ups_collected = np.zeros(count, dtype=np.int64)
+        self.final_score = np.zeros(count, dtype=np.int64)  # Score each game ended on, last time it ended
+        self.observations = np.zeros((count, OBSERVATION_SIZE), dtype=np.float32)
+
+        self.effects = {'expand': self.expand_paddle, 'extra_ball': self.add_ball, 'additional_bricks': self.add_flashing_bricks,
+                        'remove_balls': self.remove_balls, 'shooting': self.enable_shooting}
+        missing = set(POWER_UP_KINDS) - set(self.effects)
+        if missing:
+            raise ValueError(f"no batched effect for power-ups {sorted(missing)}")
+
+    def reset(self, games=None):
+        # Start the given games (all by default) over, launched like simulate.run_game does; returns the observations
+        games = self.rows if games is None else np.asarray(games)
+        self.paddle_width[games] = self.paddle_base_width
+        self.paddle_x[games] = SCREEN_WIDTH // 2 - self.paddle_width[games] // 2
+        self.paddle_speed[games] = PADDLE_SPEED
+        self.left_pressed[games] = self.right_pressed[games] = False
+        self.shooting[games] = False
+        self.shots[games] = 0
+        for counter in (self.score, self.level, self.steps, self.balls_lost, self.power_ups_collected):
+            counter[games] = 0
+        self.start_level(games)
+        return self.observe()
+
+    def start_level(self, games):
+        # A new wall and a single ball leaving the paddle, as start_next_level does
+        self.paddle_width[games] = self.paddle_base_width
+        self.ball_count[games] = 0
+        self.append_balls(games, self.rng.choice([-1.0, 1.0], len(games)) * self.speed, bounce=False)
+        self.alive[games] = False
+        self.alive[games, :WALL_SLOTS] = True
+        self.requires_two_hits[games] = False
+        self.requires_two_hits[games, :WALL_SLOTS] = self.rng.random((len(games), WALL_SLOTS)) < 0.5
+        self.cracked[games] = False
+        self.bricks_left[games] = WALL_SLOTS
+        self.power_up_count[games] = 0
+
+    def step(self, actions):
+        # Advance every game by one physics step; returns (observations, rewards, dones). The reward is
+        # the points scored in the step.
+        actions = np.asarray(actions)
+        left = (actions & ACTION_LEFT) != 0
+        right = (actions & ACTION_RIGHT) != 0
+        score = self.score.copy()
+
+        # Shots are fired before the step, like queued Space presses
+        firing = np.flatnonzero((actions & ACTION_FIRE != 0) & self.shooting & (self.shots > 0) & (self.ball_count < BALL_SLOTS))
+        if len(firing):
+            self.append_balls(firing)
+            self.shots[firing] -= 1
+            self.shooting[firing] = self.shots[firing] > 0
+
+        self.move_paddles(left, right)
+        for slot in range(self.ball_count.max(initial=0)):
+            self.move_balls(np.flatnonzero(self.ball_count > slot), slot)
+        self.bounce_balls()
+        self.move_power_ups()
+        self.drop_fallen_balls()
+
+        self.steps += 1
+        game_over = self.ball_count == 0
+        cleared = np.flatnonzero((self.bricks_left == 0) & ~game_over)
+        if len(cleared):
+            self.level[cleared] += 1
+            self.start_level(cleared)
+        rewards = self.score - score
+        dones = game_over | (self.steps >= self.max_steps)
+        finished = np.flatnonzero(dones)
+        if len(finished):
+            self.final_score[finished] = self.score[finished]
+            self.reset(finished)
+        return self.observe(), rewards, dones
+
+    def move_paddles(self, left, right):
+        # Letting go of a direction drops the paddle back to its base speed; held keys accelerate it
+        released = (self.left_pressed & ~left) | (self.right_pressed & ~right)
+        self.paddle_speed[released] = PADDLE_SPEED
+        self.left_pressed, self.right_pressed = left, right
+        x, width, speed = self.paddle_x, self.paddle_width, self.paddle_speed
+        for pressed, direction in ((left, -1), (right, 1)):
+            speed[pressed & (speed < PADDLE_MAX_SPEED)] += PADDLE_ACCELERATION
+            if direction < 0:
+                moving = pressed & (x > 0)
+                x[moving] = np.maximum(x[moving] - speed[moving], 0)
+            else:
+                moving = pressed & (x + width < SCREEN_WIDTH)
+                x[moving] = np.minimum(x[moving] + speed[moving], SCREEN_WIDTH - width[moving])
+
+    def move_balls(self, games, slot):
+        # Ball.move for one ball slot of the given games, sweeping through up to MAX_BOUNCES_PER_STEP
+        # bricks and breaking them as they are struck, so the next slot sees the bricks this one broke
+        x = self.ball_x[games, slot]
+        y = self.ball_y[games, slot]
+        dx = self.ball_dx[games, slot]
+        dy = self.ball_dy[games, slot]
+        remaining = np.ones(len(games))
+        struck = np.full((len(games), MAX_BOUNCES_PER_STEP), -1)
+        moving = np.arange(len(games))
+        for bounce in range(MAX_BOUNCES_PER_STEP):
+            step_x, step_y = dx[moving] * remaining[moving], dy[moving] * remaining[moving]
+            balls, bricks = self.nearby_bricks(games[moving], x[moving], y[moving], step_x, step_y, struck[moving])
+            hit = np.zeros(len(moving), dtype=bool)
+            if len(balls):
+                left, top = BRICK_X[bricks], BRICK_Y[bricks]
+                t, normal_x, normal_y = sweep_circles_rects(x[moving][balls] + BALL_RADIUS, y[moving][balls] + BALL_RADIUS,
+                                                            step_x[balls], step_y[balls],
+                                                            left, top, left + BRICK_WIDTH, top + BRICK_HEIGHT)
+                # The earliest strike of each ball; ties go to the brick found first, as in Ball.move
+                order = np.lexsort((t, balls))
+                first = order[np.r_[True, balls[order][1:] != balls[order][:-1]]]
+                first = first[t[first] < np.inf]
+                hit[balls[first]] = True
+
+            missed = moving[~hit]
+            x[missed] += step_x[~hit]
+            y[missed] += step_y[~hit]
+            if not hit.any():
+                break
+            moving, step_x, step_y = moving[hit], step_x[hit], step_y[hit]
+            t, normal_x, normal_y, bricks = t[first], normal_x[first], normal_y[first], bricks[first]
+            x[moving] += step_x * t
+            y[moving] += step_y * t
+            dot = dx[moving] * normal_x + dy[moving] * normal_y
+            dx[moving] -= 2 * dot * normal_x
+            dy[moving] -= 2 * dot * normal_y
+            remaining[moving] *= 1 - t
+            struck[moving, bounce] = bricks
+            self.hit_bricks(games[moving], bricks)
+            moving = moving[remaining[moving] > 0]
+        self.ball_x[games, slot] = np.round(x)
+        self.ball_y[games, slot] = np.round(y)
+        self.ball_dx[games, slot] = dx
+        self.ball_dy[games, slot] = dy
+
+    def nearby_bricks(self, games, x, y, step_x, step_y, struck):
+        # Live bricks that the box around each ball's path overlaps, as BrickGrid.query finds them for
+        # Ball.move, leaving out the ones the ball already struck this step. Returns (ball, brick slot)
+        # pairs. A path box is smaller than a lattice cell, so it reaches two rows and columns of each lattice.
+        top = np.trunc(np.minimum(y, y + step_y)) - 1
+        # Most balls are below every brick at any moment; only the rest go through the lattices
+        candidates = np.flatnonzero(top < BRICKS_BOTTOM)
+        if not len(candidates):
+            return candidates, candidates
+        x, y, step_x, step_y, top = x[candidates], y[candidates], step_x[candidates], step_y[candidates], top[candidates]
+        left = np.trunc(np.minimum(x, x + step_x)) - 1
+        right = left + np.trunc(np.abs(step_x)) + BALL_SIZE + 3
+        bottom = top + np.trunc(np.abs(step_y)) + BALL_SIZE + 3
+        balls, bricks = [], []
+        for offset_x, offset_y, columns, rows, first in LATTICES:
+            first_row = np.floor((top - offset_y - BRICK_HEIGHT) / GRID_CELL_HEIGHT).astype(np.int64) + 1
+            first_column = np.floor((left - offset_x - BRICK_WIDTH) / GRID_CELL_WIDTH).astype(np.int64) + 1
+            for row in (first_row, first_row + 1):
+                brick_y = offset_y + row * GRID_CELL_HEIGHT
+                row_near = (row >= 0) & (row < rows) & (brick_y < bottom) & (top < brick_y + BRICK_HEIGHT)
+                for column in (first_column, first_column + 1):
+                    brick_x = offset_x + column * GRID_CELL_WIDTH
+                    near = np.flatnonzero(row_near & (column >= 0) & (column < columns) &
+                                          (brick_x < right) & (left < brick_x + BRICK_WIDTH))
+                    balls.append(near)
+                    bricks.append(first + row[near] * columns + column[near])
+        balls = candidates[np.concatenate(balls)]
+        bricks = np.concatenate(bricks)
+        live = self.alive[games[balls], bricks] & ~(struck[balls] == bricks[:, None]).any(axis=1)
+        return balls[live], bricks[live]
+
+    def hit_bricks(self, games, bricks):
+        # Brick.hit_brick for one brick per game, then the score, power-up drop and removal of those destroyed
+        self.score[games] += 1
+        destroyed = ~self.requires_two_hits[games, bricks] | self.cracked[games, bricks]
+        self.cracked[games[~destroyed], bricks[~destroyed]] = True
+        games, bricks = games[destroyed], bricks[destroyed]
+        self.alive[games, bricks] = False
+        self.bricks_left[games] -= 1
+        kinds = roll_power_ups(len(games), self.rng)
+        dropped = kinds != NO_POWER_UP
+        games, bricks, kinds = games[dropped], bricks[dropped], kinds[dropped]
+        room = self.power_up_count[games] < POWER_UP_SLOTS
+        games, bricks, kinds = games[room], bricks[room], kinds[room]
+        slots = self.power_up_count[games]
+        self.power_up_x[games, slots] = BRICK_X[bricks] + BRICK_WIDTH // 2 - POWER_UP_SIZE // 2
+        self.power_up_y[games, slots] = BRICK_Y[bricks]
+        self.power_up_kind[games, slots] = kinds
+        self.power_up_count[games] += 1
+
+    def bounce_balls(self):
+        # Walls, then the paddle, for every ball in play, as in step_game
+        in_play = np.arange(BALL_SLOTS) < self.ball_count[:, None]
+        x, y, dx, dy = self.ball_x, self.ball_y, self.ball_dx, self.ball_dy
+        wall = in_play & (x <= 0)
+        x[wall] = 0
+        dx[wall] = -dx[wall]
+        wall = in_play & (x + BALL_SIZE >= SCREEN_WIDTH)
+        x[wall] = SCREEN_WIDTH - 2 * BALL_SIZE  # step_game puts the ball's right edge at SCREEN_WIDTH - width
+        dx[wall] = -dx[wall]
+        wall = in_play & (y <= 0)
+        y[wall] = 0
+        dy[wall] = -dy[wall]
+
+        paddle_x, paddle_width = self.paddle_x[:, None], self.paddle_width[:, None]
+        on_paddle = (in_play & (x < paddle_x + paddle_width) & (paddle_x < x + BALL_SIZE) &
+                     (y < PADDLE_Y + PADDLE_HEIGHT) & (PADDLE_Y < y + BALL_SIZE))
+        if on_paddle.any():
+            games, slots = np.nonzero(on_paddle)
+            dx[games, slots], dy[games, slots] = self.paddle_bounce(games, x[games, slots], dy[games, slots])
+
+    def paddle_bounce(self, games, x, dy):
+        # Ball.bounce_off_paddle: returns the new (dx, dy)
+        hit_pos = (x + BALL_RADIUS - self.paddle_x[games]) / self.paddle_width[games]
+        max_speed = self.speed * 1.5
+        return np.clip((hit_pos - 0.5) * 2 * self.speed, -max_speed, max_speed), -np.abs(dy)
+
+    def append_balls(self, games, dx=None, bounce=True):
+        # Put a ball on the paddle of each of the given games, leaving it as add_ball and shoot do
+        room = self.ball_count[games] < BALL_SLOTS
+        games = games[room]
+        if dx is not None:
+            dx = dx[room]
+        slots = self.ball_count[games]
+        x = self.paddle_x[games] + self.paddle_width[games] // 2 - BALL_RADIUS
+        dy = np.full(len(games), -float(self.speed))
+        self.ball_x[games, slots] = x
+        self.ball_y[games, slots] = PADDLE_Y - BALL_SIZE
+        if bounce:
+            dx, dy = self.paddle_bounce(games, x, dy)
+        self.ball_dx[games, slots] = dx
+        self.ball_dy[games, slots] = dy
+        self.ball_count[games] += 1
+
+    def move_power_ups(self):
+        # Power-ups fall, and are caught or lost, in the order they dropped; effects can change the paddle
+        # for the ones after them
+        count = self.power_up_count
+        if not count.any():
+            return
+        kept = np.arange(POWER_UP_SLOTS) < count[:, None]
+        for slot in range(count.max()):
+            games = np.flatnonzero(count > slot)
+            y = self.power_up_y[games, slot] + POWER_UP_SPEED
+            self.power_up_y[games, slot] = y
+            x, paddle_x = self.power_up_x[games, slot], self.paddle_x[games]
+            caught = ((x < paddle_x + self.paddle_width[games]) & (paddle_x < x + POWER_UP_SIZE) &
+                      (y < PADDLE_Y + PADDLE_HEIGHT) & (PADDLE_Y < y + POWER_UP_SIZE))
+            kept[games[caught | (y >= SCREEN_HEIGHT)], slot] = False
+            if caught.any():
+                kinds = self.power_up_kind[games, slot]
+                self.power_ups_collected[games[caught]] += 1
+                for kind, name in enumerate(POWER_UP_KINDS):
+                    catching = games[caught & (kinds == kind)]
+                    if len(catching):
+                        self.effects[name](catching)
+        count = kept.sum(axis=1)
+        if (count == self.power_up_count).all():
+            return
+        self.power_up_count = count
+        order = np.argsort(~kept, axis=1, kind='stable')
+        for field in (self.power_up_x, self.power_up_y, self.power_up_kind):
+            field[:] = np.take_along_axis(field, order, axis=1)
+
+    def drop_fallen_balls(self):
+        in_play = np.arange(BALL_SLOTS) < self.ball_count[:, None]
+        kept = in_play & (self.ball_y < SCREEN_HEIGHT)
+        if (kept == in_play).all():
+            return
+        self.keep_balls(kept)
+        self.balls_lost += in_play.sum(axis=1) - self.ball_count
+
+    def keep_balls(self, kept):
+        # Drop the balls not kept, closing the gaps without changing the order of the rest
+        self.ball_count = kept.sum(axis=1)
+        order = np.argsort(~kept, axis=1, kind='stable')
+        for field in (self.ball_x, self.ball_y, self.ball_dx, self.ball_dy):
+            field[:] = np.take_along_axis(field, order, axis=1)
+
+    def spawn_bricks(self, games, count, requires_two_hits):
+        # spawn_positions: up to count random free slots on the spawn lattice of each game
+        free = ~self.alive[games, WALL_SLOTS:]
+        keys = np.where(free, self.rng.random(free.shape), np.inf)
+        chosen = np.argsort(keys, axis=1)[:, :count]
+        chosen_free = np.take_along_axis(free, chosen, axis=1)
+        rows = np.repeat(games, count).reshape(len(games), count)[chosen_free]
+        bricks = WALL_SLOTS + chosen[chosen_free]
+        self.alive[rows, bricks] = True
+        self.requires_two_hits[rows, bricks] = requires_two_hits
+        self.cracked[rows, bricks] = False
+        self.bricks_left[games] += chosen_free.sum(axis=1)
+
+    # Power-up effects, each run for the games whose paddle caught one
+    def expand_paddle(self, games):
+        self.paddle_width[games] = np.minimum((self.paddle_width[games] * 1.25).astype(np.int64), PADDLE_MAX_WIDTH)
+
+    def add_ball(self, games):
+        self.append_balls(games)
+
+    def add_flashing_bricks(self, games):
+        self.spawn_bricks(games, 5, True)
+
+    def remove_balls(self, games):
+        several = games[self.ball_count[games] > 1]
+        if len(several):
+            in_play = np.arange(BALL_SLOTS) < self.ball_count[several, None]
+            highest = np.argmin(np.where(in_play, self.ball_y[several], np.inf), axis=1)
+            kept = np.arange(BALL_SLOTS) < self.ball_count[:, None]
+            kept[several] = False
+            kept[several, highest] = True
+            self.keep_balls(kept)
+        single = games[self.ball_count[games] <= 1]
+        if len(single):
+            self.spawn_bricks(single, 3, False)
+        self.paddle_width[games] = self.paddle_base_width
+
+    def enable_shooting(self, games):
+        self.shooting[games] = True
+        self.shots[games] = 5
+
+    def observe(self):
+        # Fill the observation rows in place; the array returned is overwritten by the next step
+        observations = self.observations
+        observations[:, 0] = self.paddle_x
+        observations[:, 1] = self.paddle_width
+        observations[:, 2] = self.shots
+        balls = observations[:, 3:3 + BALL_SLOTS * 4].reshape(self.count, BALL_SLOTS, 4)
+        empty = np.arange(BALL_SLOTS) >= self.ball_count[:, None]
+        for index, field in enumerate((self.ball_x, self.ball_y, self.ball_dx, self.ball_dy)):
+            balls[:, :, index] = field
+            balls[:, :, index][empty] = 0
+        bricks = observations[:, 3 + BALL_SLOTS * 4:3 + BALL_SLOTS * 4 + BRICK_SLOTS]
+        bricks[:] = self.alive
+        bricks[self.alive & self.cracked] = 0.5
+        power_ups = observations[:, OBSERVATION_SIZE - POWER_UP_SLOTS * 3:].reshape(self.count, POWER_UP_SLOTS, 3)
+        empty = np.arange(POWER_UP_SLOTS) >= self.power_up_count[:, None]
+        for index, field in enumerate((self.power_up_x, self.power_up_y, self.power_up_kind + 1)):
+            power_ups[:, :, index] = field
+            power_ups[:, :, index][empty] = 0
+        return observations
+
+
+# simulate.track_policy for every game at once: follow the lowest falling ball (or the lowest ball),
+# with the contact point drifting so returns leave at varied angles, and fire whenever there are shots
+def track_actions(env):
+    in_play = np.arange(BALL_SLOTS) < env.ball_count[:, None]
+    falling = in_play & (env.ball_dy > 0)
+    chosen = np.where(falling.any(axis=1)[:, None], falling, in_play)
+    lowest = np.argmax(np.where(chosen, env.ball_y, -np.inf), axis=1)
+    target = env.ball_x[env.rows, lowest] + BALL_RADIUS
+    aim = ((env.steps // 300) % 5 - 2) * env.paddle_width // 6
+    offset = target - aim - (env.paddle_x + env.paddle_width // 2)
+    dead_zone = PADDLE_SPEED // 2
+    return (np.where(offset < -dead_zone, ACTION_LEFT, 0) | np.where(offset > dead_zone, ACTION_RIGHT, 0) |
+            np.where(env.shooting, ACTION_FIRE, 0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Step many games at once and report env-steps per second.")
+    parser.add_argument('--envs', type=int, default=4096, help="games stepped together")
+    parser.add_argument('--steps', type=int, default=1000, help="steps to run")
+    parser.add_argument('--difficulty', type=int, choices=[1, 2, 3], default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--policy', choices=['track', 'random'], default='track')
+    args = parser.parse_args()
+
+    env = VecEnv(args.envs, args.difficulty, args.seed)
+    env.reset()
+    rng = np.random.default_rng(args.seed)
+    games = 0
+    points = 0
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        actions = track_actions(env) if args.policy == 'track' else rng.integers(0, 8, args.envs)
+        _, rewards, dones = env.step(actions)
+        points += int(rewards.sum())
+        games += int(dones.sum())
+    elapsed = time.perf_counter() - start
+    print(f"{args.envs} games x {args.steps} steps in {elapsed:.2f}s ({args.envs * args.steps / elapsed:.0f} env-steps/s)")
+    print(f"{games} games finished, {points} points scored, mean final score "
+          f"{env.final_score[env.final_score > 0].mean() if (env.final_score > 0).any() else 0:.1f}")
+
+
+if __name__ == '__main__':
+    main()